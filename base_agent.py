@@ -7,102 +7,149 @@
 import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Set, Callable, Any
 from collections import defaultdict
 from datetime import datetime
 
+import aiohttp
+
 from models import AgentMessage, MessageType
+from http_client import get_session, close_session
 
 
 class MessageBus:
     """
     訊息匯流排 - 負責代理間的訊息傳遞
     實現發布/訂閱模式
+    
+    publish() 為每則訊息建立一個 Task 直接派送，不經過佇列；
+    同一接收者的訊息依發布順序開始處理，不同接收者之間不保證順序。
+    同時處理中的訊息最多 MAX_PENDING 則，超過時 publish() 會等待。
+    
+    注意：目前代理之間都經由 send_direct()（BaseAgent.send_message）
+    在呼叫端直接等待處理完成，背壓來自呼叫端本身與 MotherAgent 的任務佇列；
+    publish() / publish_nowait() 的 MAX_PENDING 上限只對非同步發布的訊息生效。
     """
     
     _instance = None
+    MAX_PENDING = 256
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
+            instance = super().__new__(cls)
+            instance._init_state()
+            cls._instance = instance
         return cls._instance
     
-    def __init__(self):
-        if self._initialized:
-            return
-        
+    def _init_state(self):
+        """初始化共用狀態（只在建立單例時執行一次）"""
         self.logger = logging.getLogger("MessageBus")
         self.subscribers: Dict[str, List[Callable]] = defaultdict(list)
-        self.message_queue: asyncio.Queue = asyncio.Queue()
         self.agents: Dict[str, 'BaseAgent'] = {}
+        # 群組名稱 -> {代理名稱: 代理}
+        self.groups: Dict[str, Dict[str, 'BaseAgent']] = defaultdict(dict)
         self._running = False
-        self._initialized = True
+        self._pending: Set[asyncio.Task] = set()
+        # 每則處理中的訊息佔用一個位置，滿了就讓發布者等待（背壓）
+        self._slots = asyncio.BoundedSemaphore(self.MAX_PENDING)
     
     def register_agent(self, agent: 'BaseAgent'):
         """註冊代理"""
         self.agents[agent.name] = agent
-        self.logger.info(f"✅ 代理已註冊: {agent.name}")
+        self.logger.info("✅ 代理已註冊: %s", agent.name)
+    
+    def join_group(self, group: str, agent: 'BaseAgent'):
+        """
+        加入廣播群組：receiver 為群組名稱的訊息會以同一個物件送給所有成員
+        以代理名稱為鍵，同名代理重複加入時取代舊的成員（不會收到兩次訊息）
+        """
+        self.groups[group][agent.name] = agent
     
     def subscribe(self, agent_name: str, callback: Callable):
         """訂閱特定代理的訊息"""
         self.subscribers[agent_name].append(callback)
     
     async def publish(self, message: AgentMessage):
-        """發布訊息"""
-        await self.message_queue.put(message)
+        """發布訊息（非同步派送給接收者和訂閱者）"""
+        await self._slots.acquire()
+        self._dispatch(message)
+    
+    async def publish_nowait(self, message: AgentMessage) -> bool:
+        """發布訊息，處理中訊息已滿時直接丟棄並回傳 False（不會等待）"""
+        if self._slots.locked():
+            self.logger.warning(
+                "⚠️ 訊息匯流排已滿，丟棄訊息: %s -> %s [%s]",
+                message.sender, message.receiver, message.msg_type.value
+            )
+            return False
+        # 還有位置時 acquire() 立即取得，不會讓出事件迴圈
+        await self._slots.acquire()
+        self._dispatch(message)
+        return True
+    
+    def _dispatch(self, message: AgentMessage):
+        """建立派送 Task，完成後釋放位置"""
+        task = asyncio.create_task(self._process_message(message))
+        self._pending.add(task)
+        task.add_done_callback(self._on_dispatch_done)
         self.logger.debug(
-            f"📨 訊息已發布: {message.sender} -> {message.receiver} "
-            f"[{message.msg_type.value}]"
+            "📨 訊息已發布: %s -> %s [%s]",
+            message.sender, message.receiver, message.msg_type.value
         )
     
+    def _on_dispatch_done(self, task: asyncio.Task):
+        self._pending.discard(task)
+        self._slots.release()
+    
     async def send_direct(self, message: AgentMessage):
         """直接發送訊息給特定代理"""
-        if message.receiver in self.agents:
-            agent = self.agents[message.receiver]
+        agent = self.agents.get(message.receiver)
+        if agent is not None:
             await agent.receive_message(message)
             self.logger.info(
-                f"📬 直接傳送: {message.sender} -> {message.receiver} "
-                f"[{message.msg_type.value}]"
+                "📬 直接傳送: %s -> %s [%s]",
+                message.sender, message.receiver, message.msg_type.value
+            )
+        elif message.receiver in self.groups:
+            members = list(self.groups[message.receiver].values())
+            results = await asyncio.gather(
+                *(member.receive_message(message) for member in members),
+                return_exceptions=True
+            )
+            for member, result in zip(members, results):
+                if isinstance(result, Exception):
+                    self.logger.error("❌ 訊息處理錯誤 (%s): %s", member.name, result)
+            self.logger.info(
+                "📬 廣播傳送: %s -> %s (%d 個代理) [%s]",
+                message.sender, message.receiver, len(members), message.msg_type.value
             )
         else:
-            self.logger.warning(f"⚠️ 找不到目標代理: {message.receiver}")
+            self.logger.warning("⚠️ 找不到目標代理: %s", message.receiver)
     
     async def start(self):
-        """啟動訊息處理迴圈"""
+        """啟動訊息匯流排"""
         self._running = True
         self.logger.info("🚀 訊息匯流排已啟動")
-        
-        while self._running:
-            try:
-                # 使用 timeout 避免無限等待
-                message = await asyncio.wait_for(
-                    self.message_queue.get(),
-                    timeout=1.0
-                )
-                await self._process_message(message)
-            except asyncio.TimeoutError:
-                continue
-            except Exception as e:
-                self.logger.error(f"❌ 訊息處理錯誤: {e}")
     
     async def _process_message(self, message: AgentMessage):
-        """處理單一訊息"""
-        # 發送給特定接收者
-        if message.receiver in self.agents:
-            agent = self.agents[message.receiver]
-            await agent.receive_message(message)
+        """處理單一訊息：接收者與所有訂閱者回調同時執行"""
+        coros = [callback(message) for callback in self.subscribers.get(message.receiver, [])]
+        agent = self.agents.get(message.receiver)
+        if agent is not None:
+            coros.append(agent.receive_message(message))
+        for member in self.groups.get(message.receiver, {}).values():
+            coros.append(member.receive_message(message))
         
-        # 觸發訂閱者回調
-        for callback in self.subscribers.get(message.receiver, []):
-            try:
-                await callback(message)
-            except Exception as e:
-                self.logger.error(f"回調執行錯誤: {e}")
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error("❌ 訊息處理錯誤: %s", result)
     
     def stop(self):
         """停止訊息匯流排"""
         self._running = False
+        for task in self._pending:
+            task.cancel()
         self.logger.info("🛑 訊息匯流排已停止")
 
 
@@ -131,7 +178,8 @@ class BaseAgent(ABC):
     async def receive_message(self, message: AgentMessage):
         """接收並處理訊息"""
         self.logger.info(
-            f"📩 收到訊息: 來自 {message.sender} [{message.msg_type.value}]"
+            "📩 收到訊息: 來自 %s [%s]",
+            message.sender, message.msg_type.value
         )
         
         handler = self._message_handlers.get(message.msg_type)
@@ -145,6 +193,18 @@ class BaseAgent(ABC):
         """處理訊息 - 子類別必須實作"""
         pass
     
+    async def start(self):
+        """啟動代理的背景工作 - 子類別可覆寫"""
+        pass
+    
+    async def close(self):
+        """釋放代理持有的資源 - 子類別可覆寫（共用的 HTTP session 由協調器關閉）"""
+        pass
+    
+    async def _get_http(self) -> aiohttp.ClientSession:
+        """取得所有代理共用的 HTTP session（見 http_client），保留連線以重複使用"""
+        return get_session()
+    
     async def send_message(
         self,
         receiver: str,
@@ -160,14 +220,34 @@ class BaseAgent(ABC):
         )
         await self.message_bus.send_direct(message)
     
-    def log_info(self, msg: str):
-        self.logger.info(f"[{self.name}] {msg}")
+    async def send_to(
+        self,
+        agent: 'BaseAgent',
+        msg_type: MessageType,
+        payload: Any
+    ):
+        """已持有目標代理參考時直接發送，不經過訊息匯流排查找"""
+        message = AgentMessage(
+            msg_type=msg_type,
+            sender=self.name,
+            receiver=agent.name,
+            payload=payload
+        )
+        await agent.receive_message(message)
+    
+    def _log(self, level: int, msg: str, *args):
+        """只在該層級會輸出時才組合訊息，args 以 % 格式延遲套用"""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, f"[{self.name}] {msg}", *args)
+    
+    def log_info(self, msg: str, *args):
+        self._log(logging.INFO, msg, *args)
     
-    def log_error(self, msg: str):
-        self.logger.error(f"[{self.name}] {msg}")
+    def log_error(self, msg: str, *args):
+        self._log(logging.ERROR, msg, *args)
     
-    def log_warning(self, msg: str):
-        self.logger.warning(f"[{self.name}] {msg}")
+    def log_warning(self, msg: str, *args):
+        self._log(logging.WARNING, msg, *args)
 
 
 class AgentOrchestrator:
@@ -184,25 +264,36 @@ class AgentOrchestrator:
     def add_agent(self, agent: BaseAgent):
         """添加代理"""
         self.agents[agent.name] = agent
-        self.logger.info(f"✅ 代理已添加到協調器: {agent.name}")
+        self.logger.info("✅ 代理已添加到協調器: %s", agent.name)
     
     async def start(self):
         """啟動所有代理"""
         self.logger.info("🚀 正在啟動 Multi-Agent 系統...")
         
         # 啟動訊息匯流排
-        bus_task = asyncio.create_task(self.message_bus.start())
-        self._tasks.append(bus_task)
+        await self.message_bus.start()
         
-        self.logger.info(f"📊 已註冊 {len(self.agents)} 個代理")
+        for agent in self.agents.values():
+            await agent.start()
+        
+        self.logger.info("📊 已註冊 %d 個代理", len(self.agents))
         for name in self.agents:
-            self.logger.info(f"   - {name}")
+            self.logger.info("   - %s", name)
     
     async def stop(self):
         """停止所有代理"""
         self.logger.info("🛑 正在停止 Multi-Agent 系統...")
         self.message_bus.stop()
         
+        for agent in self.agents.values():
+            try:
+                await agent.close()
+            except Exception as e:
+                self.logger.error("關閉代理失敗 %s: %s", agent.name, e)
+        
+        # 所有代理都關閉後再關閉共用的 HTTP session
+        await close_session()
+        
         for task in self._tasks:
             task.cancel()
             try:
@@ -3,12 +3,17 @@
 """
 設定檔和工具函數
 """
-import os
-import json
+import asyncio
+import contextvars
+import copy
 import logging
-from typing import Dict, Optional
+import functools
+from types import MappingProxyType
+from typing import Dict, Iterable, Optional
 from urllib.parse import urlparse, quote
 
+import orjson
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,14 +27,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1024)
 def encode_image_url(url: str) -> str:
     """
     Properly encode image URL for API requests.
     Chinese characters and special characters need to be percent-encoded.
+    Already-encoded ASCII URLs are returned unchanged.
     """
     if not url:
         return url
 
+    if url.isascii() and ' ' not in url:
+        return url
+
     parsed = urlparse(url)
     path_parts = parsed.path.split('/')
     encoded_parts = [quote(part, safe='') for part in path_parts]
@@ -42,6 +52,18 @@ def encode_image_url(url: str) -> str:
     return encoded_url
 
 
+async def to_thread_fast(func, *args, **kwargs):
+    """
+    在預設執行緒池執行同步函式（如 tweepy 呼叫），不阻塞事件迴圈
+    與 asyncio.to_thread 相同，但 context 為空時省略 ctx.run 包裝
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    if not ctx:
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    return await loop.run_in_executor(None, functools.partial(ctx.run, func, *args, **kwargs))
+
+
 class Config:
     """設定管理類別"""
     
@@ -81,24 +103,12 @@ class Config:
         self.credentials = self._load_or_create_config()
     
     def _load_or_create_config(self) -> Dict:
-        """載入或建立設定檔"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                # 確保 ollama 設定存在
-                if 'ollama' not in config:
-                    config['ollama'] = self.DEFAULT_CONFIG['ollama']
-                    self._save_config(config)
-                return config
-        else:
-            self._save_config(self.DEFAULT_CONFIG)
-            logger.info(f"已建立預設設定檔: {self.config_file}")
-            return self.DEFAULT_CONFIG.copy()
+        """載入或建立設定檔（深層複製，修改巢狀的憑證設定不會影響快取）"""
+        return copy.deepcopy(dict(_load_config_cached(self.config_file)))
     
     def _save_config(self, config: Dict):
         """儲存設定檔"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        _write_config(self.config_file, config)
     
     def get(self, key: str, default=None):
         """取得設定值"""
@@ -110,24 +120,75 @@ class Config:
         self._save_config(self.credentials)
 
 
+def _write_config(config_file: str, config: Dict):
+    """寫入設定檔並讓快取失效"""
+    with open(config_file, 'wb') as f:
+        f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    _load_config_cached.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_config_cached(config_file: str) -> MappingProxyType:
+    """
+    載入或建立設定檔
+    每個代理都會建立 Config()，同一路徑只讀取並解析一次
+    """
+    try:
+        with open(config_file, 'rb') as f:
+            config = orjson.loads(f.read())
+    except FileNotFoundError:
+        _write_config(config_file, Config.DEFAULT_CONFIG)
+        logger.info(f"已建立預設設定檔: {config_file}")
+        return MappingProxyType(Config.DEFAULT_CONFIG.copy())
+    
+    # 確保 ollama 設定存在
+    if 'ollama' not in config:
+        config['ollama'] = Config.DEFAULT_CONFIG['ollama']
+        _write_config(config_file, config)
+    return MappingProxyType(config)
+
+
 class ProcessedTracker:
-    """追蹤已處理的公告"""
+    """
+    追蹤已處理的公告
+    以 JSON 快照加上只追加的 .log 檔記錄，標記時只寫入一行
+    """
     
     def __init__(self, file_path: str = "processed_awards.json"):
         self.file_path = file_path
+        self.log_path = f"{file_path}.log"
         self.processed_ids = self._load()
     
     def _load(self) -> set:
-        """載入已處理的ID"""
-        if os.path.exists(self.file_path):
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return set(json.load(f))
-        return set()
+        """載入已處理的ID（快照 + 追加記錄）"""
+        processed = set()
+        try:
+            with open(self.file_path, 'rb') as f:
+                processed.update(orjson.loads(f.read()))
+        except FileNotFoundError:
+            pass
+        
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                logged = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            logged = set()
+        if logged:
+            processed.update(logged)
+            self._compact(processed)
+        
+        return processed
     
-    def _save(self):
-        """儲存已處理的ID"""
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(list(self.processed_ids), f, ensure_ascii=False)
+    def _save(self, announcement_ids: Iterable[str]):
+        """追加已處理的ID"""
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.writelines(f"{announcement_id}\n" for announcement_id in announcement_ids)
+    
+    def _compact(self, processed_ids: set):
+        """將所有ID寫回快照並清空追加記錄"""
+        with open(self.file_path, 'wb') as f:
+            f.write(orjson.dumps(list(processed_ids)))
+        open(self.log_path, 'w', encoding='utf-8').close()
     
     def is_processed(self, announcement_id: str) -> bool:
         """檢查是否已處理"""
@@ -135,10 +196,20 @@ class ProcessedTracker:
     
     def mark_processed(self, announcement_id: str):
         """標記為已處理"""
-        self.processed_ids.add(announcement_id)
-        self._save()
+        self.mark_processed_bulk((announcement_id,))
+    
+    def mark_processed_bulk(self, announcement_ids: Iterable[str]):
+        """一次標記多筆為已處理，只寫入檔案一次"""
+        new_ids = [
+            announcement_id for announcement_id in dict.fromkeys(announcement_ids)
+            if announcement_id not in self.processed_ids
+        ]
+        if not new_ids:
+            return
+        self.processed_ids.update(new_ids)
+        self._save(new_ids)
     
     def clear(self):
         """清除所有記錄"""
         self.processed_ids.clear()
-        self._save()
+        self._compact(self.processed_ids)
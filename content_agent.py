@@ -22,6 +22,72 @@ from base_agent import BaseAgent
 from config import Config
 
 
+# 思考過程標記和 hashtag 解析用的正規表示式
+_THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+_THINK_ZH_RE = re.compile(r'\[思考\].*?\[/思考\]', re.DOTALL)
+_THINK_EN_RE = re.compile(r'\[thinking\].*?\[/thinking\]', re.DOTALL | re.IGNORECASE)
+_HASHTAG_ZH_RE = re.compile(r'#[\w\u4e00-\u9fff]+')
+_HASHTAG_EN_RE = re.compile(r'#\w+')
+
+# 提示模板只需建立一次，chain 在 _init_llm 中組裝
+_ZH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """你是陽明交通大學 AI 學院的社交媒體編輯。
+你的任務是將獲獎公告改寫成適合社交媒體發布的恭喜文章。
+
+要求：
+1. 保持正式但親切的語氣
+2. 突出獲獎者的成就
+3. 包含對學校和學院的正面形象
+4. 適合在 Facebook、LinkedIn 等平台發布
+5. 字數控制在 200 字以內"""),
+    ("user", """請將以下獲獎公告改寫成社交媒體恭喜貼文：
+
+標題：{title}
+
+原文：{content}
+
+請直接輸出改寫後的內容，不需要其他說明。""")
+])
+
+_EN_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a social media editor for National Yang Ming Chiao Tung University (NYCU) College of AI.
+Your task is to create an English congratulatory post for award announcements.
+
+Requirements:
+1. Professional yet warm tone
+2. Highlight the achievement
+3. Keep it concise (under 150 words)
+4. Suitable for Twitter, LinkedIn, and international audiences
+5. Include the English translation of Chinese names in pinyin format (e.g., 王大明 -> Wang Da-Ming)"""),
+    ("user", """Please create an English social media post for this award announcement:
+
+Title: {title}
+
+Content: {content}
+
+Output format:
+TITLE: [English title]
+CONTENT: [English content]""")
+])
+
+_HASHTAGS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Generate relevant hashtags for a university award announcement.
+Output exactly 5 Chinese hashtags and 5 English hashtags.
+
+Format:
+ZH: #tag1 #tag2 #tag3 #tag4 #tag5
+EN: #tag1 #tag2 #tag3 #tag4 #tag5"""),
+    ("user", "Title: {title}\nContent: {content}")
+])
+
+_TWITTER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Create a tweet (max 250 characters) for this announcement.
+Use English only. Include 2-3 relevant hashtags.
+Be concise and impactful."""),
+    ("user", "Title: {title}\nContent: {content}")
+])
+
+
 class ContentAgent(BaseAgent):
     """
     內容生成代理
@@ -41,12 +107,34 @@ class ContentAgent(BaseAgent):
         model = ollama_config.get('model', 'deepseek-r1:7b')
         
         try:
-            self.llm = ChatOllama(
+            # 長文（中英文內容）與短文（hashtags、推文）使用不同的生成上限；
+            # deepseek-r1 的 <think> 區塊也會計入 num_predict，短文上限需保留空間
+            self._llm_long = ChatOllama(
                 base_url=base_url,
                 model=model,
                 temperature=0.7,
                 num_predict=2048,
             )
+            self._llm_short = ChatOllama(
+                base_url=base_url,
+                model=model,
+                temperature=0.7,
+                num_predict=512,
+            )
+            # hashtags 需要固定格式，降低 temperature 讓輸出更穩定
+            self._llm_hashtags = ChatOllama(
+                base_url=base_url,
+                model=model,
+                temperature=0.3,
+                num_predict=512,
+            )
+            self.llm = self._llm_long
+            
+            parser = StrOutputParser()
+            self._chain_zh = _ZH_PROMPT | self._llm_long | parser
+            self._chain_en = _EN_PROMPT | self._llm_long | parser
+            self._chain_hashtags = _HASHTAGS_PROMPT | self._llm_hashtags | parser
+            self._chain_twitter = _TWITTER_PROMPT | self._llm_short | parser
             self.log_info(f"✅ LLM 初始化成功: {model} @ {base_url}")
         except Exception as e:
             self.log_error(f"❌ LLM 初始化失敗: {e}")
@@ -93,16 +181,33 @@ class ContentAgent(BaseAgent):
             return self._fallback_generate(announcement)
         
         try:
-            # 生成中文內容
-            content_zh = await self._generate_chinese_content(announcement)
+            # 中文內容、英文內容、hashtags 互相獨立，同時生成
+            content_zh, content_en, hashtags = await asyncio.gather(
+                self._generate_chinese_content(announcement),
+                self._generate_english_content(announcement),
+                self._generate_hashtags(announcement),
+                return_exceptions=True
+            )
             
-            # 生成英文內容
-            content_en = await self._generate_english_content(announcement)
+            # 個別失敗的欄位改用備用內容，避免單一超時影響整批
+            if any(isinstance(r, BaseException) for r in (content_zh, content_en, hashtags)):
+                fallback = self._fallback_generate(announcement)
+                if isinstance(content_zh, BaseException):
+                    self.log_warning(f"中文內容使用備用值: {content_zh}")
+                    content_zh = fallback.content_zh
+                if isinstance(content_en, BaseException):
+                    self.log_warning(f"英文內容使用備用值: {content_en}")
+                    content_en = {
+                        'title': fallback.title_en,
+                        'content': fallback.content_en
+                    }
+                if isinstance(hashtags, BaseException):
+                    self.log_warning(f"Hashtags 使用備用值: {hashtags}")
+                    hashtags = (fallback.hashtags_zh, fallback.hashtags_en)
             
-            # 生成 hashtags
-            hashtags_zh, hashtags_en = await self._generate_hashtags(announcement)
+            hashtags_zh, hashtags_en = hashtags
             
-            # 生成平台特定內容
+            # 生成平台特定內容（需要英文內容）
             platform_content = await self._generate_platform_specific(
                 announcement, content_zh, content_en
             )
@@ -129,31 +234,9 @@ class ContentAgent(BaseAgent):
         announcement: AwardAnnouncement
     ) -> str:
         """生成中文恭喜內容"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """你是陽明交通大學 AI 學院的社交媒體編輯。
-你的任務是將獲獎公告改寫成適合社交媒體發布的恭喜文章。
-
-要求：
-1. 保持正式但親切的語氣
-2. 突出獲獎者的成就
-3. 包含對學校和學院的正面形象
-4. 適合在 Facebook、LinkedIn 等平台發布
-5. 字數控制在 200 字以內"""),
-            ("user", """請將以下獲獎公告改寫成社交媒體恭喜貼文：
-
-標題：{title}
-
-原文：{content}
-
-請直接輸出改寫後的內容，不需要其他說明。""")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        
         try:
             result = await asyncio.wait_for(
-                asyncio.to_thread(
-                    chain.invoke,
+                self._chain_zh.ainvoke(
                     {"title": announcement.title, "content": announcement.content}
                 ),
                 timeout=60
@@ -173,33 +256,9 @@ class ContentAgent(BaseAgent):
         announcement: AwardAnnouncement
     ) -> Dict[str, str]:
         """生成英文內容（標題和內文）"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a social media editor for National Yang Ming Chiao Tung University (NYCU) College of AI.
-Your task is to create an English congratulatory post for award announcements.
-
-Requirements:
-1. Professional yet warm tone
-2. Highlight the achievement
-3. Keep it concise (under 150 words)
-4. Suitable for Twitter, LinkedIn, and international audiences
-5. Include the English translation of Chinese names in pinyin format (e.g., 王大明 -> Wang Da-Ming)"""),
-            ("user", """Please create an English social media post for this award announcement:
-
-Title: {title}
-
-Content: {content}
-
-Output format:
-TITLE: [English title]
-CONTENT: [English content]""")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        
         try:
             result = await asyncio.wait_for(
-                asyncio.to_thread(
-                    chain.invoke,
+                self._chain_en.ainvoke(
                     {"title": announcement.title, "content": announcement.content}
                 ),
                 timeout=60
@@ -207,17 +266,11 @@ CONTENT: [English content]""")
             
             result = self._clean_output(result)
             
-            # 解析輸出
-            title_en = ""
-            content_en = ""
-            
-            lines = result.split('\n')
-            for i, line in enumerate(lines):
-                if line.startswith('TITLE:'):
-                    title_en = line.replace('TITLE:', '').strip()
-                elif line.startswith('CONTENT:'):
-                    content_en = '\n'.join(lines[i:]).replace('CONTENT:', '').strip()
-                    break
+            # 解析輸出（固定格式 TITLE: ... CONTENT: ...）
+            head, _, content_part = result.partition('CONTENT:')
+            _, _, title_part = head.partition('TITLE:')
+            title_en = title_part.strip().partition('\n')[0].strip()
+            content_en = content_part.strip()
             
             if not title_en:
                 title_en = f"Congratulations! {announcement.title}"
@@ -238,25 +291,12 @@ CONTENT: [English content]""")
         announcement: AwardAnnouncement
     ) -> tuple:
         """生成中英文 hashtags"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """Generate relevant hashtags for a university award announcement.
-Output exactly 5 Chinese hashtags and 5 English hashtags.
-
-Format:
-ZH: #tag1 #tag2 #tag3 #tag4 #tag5
-EN: #tag1 #tag2 #tag3 #tag4 #tag5"""),
-            ("user", "Title: {title}\nContent: {content}")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        
         default_zh = ["#陽明交大", "#AI學院", "#獲獎", "#人工智慧", "#研究"]
         default_en = ["#NYCU", "#AI", "#Award", "#Research", "#Achievement"]
         
         try:
             result = await asyncio.wait_for(
-                asyncio.to_thread(
-                    chain.invoke,
+                self._chain_hashtags.ainvoke(
                     {"title": announcement.title, "content": announcement.content}
                 ),
                 timeout=30
@@ -269,11 +309,11 @@ EN: #tag1 #tag2 #tag3 #tag4 #tag5"""),
             
             for line in result.split('\n'):
                 if line.startswith('ZH:'):
-                    tags = re.findall(r'#[\w\u4e00-\u9fff]+', line)
+                    tags = _HASHTAG_ZH_RE.findall(line)
                     if tags:
                         hashtags_zh = tags[:5]
                 elif line.startswith('EN:'):
-                    tags = re.findall(r'#\w+', line)
+                    tags = _HASHTAG_EN_RE.findall(line)
                     if tags:
                         hashtags_en = tags[:5]
             
@@ -293,19 +333,9 @@ EN: #tag1 #tag2 #tag3 #tag4 #tag5"""),
         platform_content = {}
         
         # Twitter - 需要精簡版本
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """Create a tweet (max 250 characters) for this announcement.
-Use English only. Include 2-3 relevant hashtags.
-Be concise and impactful."""),
-            ("user", "Title: {title}\nContent: {content}")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        
         try:
             twitter_content = await asyncio.wait_for(
-                asyncio.to_thread(
-                    chain.invoke,
+                self._chain_twitter.ainvoke(
                     {
                         "title": announcement.title,
                         "content": content_en.get('content', announcement.content)
@@ -323,11 +353,15 @@ Be concise and impactful."""),
     
     def _clean_output(self, text: str) -> str:
         """清理 LLM 輸出中的思考過程標記"""
+        # 沒有任何標記時不必跑正規表示式
+        if '<think>' not in text and '[思考]' not in text and '[thinking' not in text.lower():
+            return text.strip()
+        
         # 移除 <think>...</think> 標記
-        text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+        text = _THINK_RE.sub('', text)
         # 移除其他常見的思考標記
-        text = re.sub(r'\[思考\].*?\[/思考\]', '', text, flags=re.DOTALL)
-        text = re.sub(r'\[thinking\].*?\[/thinking\]', '', text, flags=re.DOTALL | re.IGNORECASE)
+        text = _THINK_ZH_RE.sub('', text)
+        text = _THINK_EN_RE.sub('', text)
         return text.strip()
     
     def _fallback_generate(
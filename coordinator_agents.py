@@ -5,8 +5,10 @@ Father Agent 和 Mother Agent
 負責協調和分配任務的核心代理
 """
 import asyncio
+import itertools
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from models import (
     AwardAnnouncement,
@@ -14,11 +16,18 @@ from models import (
     GeneratedContent,
     PostResult,
     AgentMessage,
-    MessageType
+    MessageType,
+    SOCIAL_BROADCAST
 )
 from base_agent import BaseAgent
 
 
+# 標題包含這些關鍵字時提高優先級
+_HIGH_PRIO_KW: Tuple[str, ...] = ('國際', '世界', '冠軍', '第一', '最佳', '傑出')
+
+_BANNER = '=' * 50
+
+
 class FatherAgent(BaseAgent):
     """
     Father Agent
@@ -26,6 +35,8 @@ class FatherAgent(BaseAgent):
     負責整體流程的監控和日誌記錄
     """
     
+    _STATS_FMT = "📊 統計: 收到 %d | 轉交 %d | 完成 %d | 失敗 %d"
+    
     def __init__(self):
         super().__init__("FatherAgent")
         self.pending_announcements: Dict[str, AwardAnnouncement] = {}
@@ -57,20 +68,20 @@ class FatherAgent(BaseAgent):
             return
         
         self.processing_stats['received'] += 1
-        self.log_info(f"📥 收到新公告: {announcement.title[:50]}...")
+        self.log_info("📥 收到新公告: %s...", announcement.title[:50])
         
         # 記錄待處理的公告
         self.pending_announcements[announcement.id] = announcement
         
         # 轉交給 Mother Agent
-        self.log_info(f"📤 轉交任務給 MotherAgent...")
+        self.log_info("📤 轉交任務給 MotherAgent...")
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.TASK_ASSIGNMENT,
             payload={
                 'announcement': announcement,
                 'priority': self._calculate_priority(announcement),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
             }
         )
         self.processing_stats['forwarded'] += 1
@@ -85,39 +96,41 @@ class FatherAgent(BaseAgent):
             self.processing_stats['completed'] += 1
             if announcement_id in self.pending_announcements:
                 del self.pending_announcements[announcement_id]
-            self.log_info(f"✅ 公告處理完成: {announcement_id}")
+            self.log_info("✅ 公告處理完成: %s", announcement_id)
         elif status == 'failed':
             self.processing_stats['failed'] += 1
-            self.log_error(f"❌ 公告處理失敗: {announcement_id}")
+            self.log_error("❌ 公告處理失敗: %s", announcement_id)
+        elif status == 'posting':
+            # 公告已交給各平台代理，回報 InformationAgent 標記為已處理
+            await self.send_message(
+                receiver="InformationAgent",
+                msg_type=MessageType.STATUS_UPDATE,
+                payload={
+                    'status': status,
+                    'announcement_id': announcement_id
+                }
+            )
+            return
         
         # 輸出統計資訊
         self._print_stats()
     
     def _calculate_priority(self, announcement: AwardAnnouncement) -> int:
-        """計算公告優先級"""
-        priority = 5  # 預設中等優先級
-        
-        # 標題包含特定關鍵字增加優先級
-        high_priority_keywords = ['國際', '世界', '冠軍', '第一', '最佳', '傑出']
-        for keyword in high_priority_keywords:
-            if keyword in announcement.title:
-                priority = min(priority + 1, 10)
-        
-        return priority
+        """計算公告優先級：預設中等優先級 5，每個高優先關鍵字 +1，上限 10"""
+        hits = sum(keyword in announcement.title for keyword in _HIGH_PRIO_KW)
+        return min(5 + hits, 10)
     
     def _print_stats(self):
         """輸出統計資訊"""
         stats = self.processing_stats
         self.log_info(
-            f"📊 統計: 收到 {stats['received']} | "
-            f"轉交 {stats['forwarded']} | "
-            f"完成 {stats['completed']} | "
-            f"失敗 {stats['failed']}"
+            self._STATS_FMT,
+            stats['received'], stats['forwarded'], stats['completed'], stats['failed']
         )
     
     async def handle_message(self, message: AgentMessage):
         """處理其他訊息"""
-        self.log_info(f"收到訊息: {message.msg_type.value} 來自 {message.sender}")
+        self.log_info("收到訊息: %s 來自 %s", message.msg_type.value, message.sender)
 
 
 class MotherAgent(BaseAgent):
@@ -139,6 +152,59 @@ class MotherAgent(BaseAgent):
             'RedditAgent'
         ]
         self.results_buffer: Dict[str, Dict[str, PostResult]] = {}
+        self._content_agent: Optional[BaseAgent] = None
+        # 待處理任務佇列：滿了之後 FatherAgent 轉交時會等待（背壓）
+        self._task_queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+        self._worker_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """啟動任務處理 worker"""
+        self._ensure_worker()
+    
+    async def close(self):
+        """停止任務處理 worker"""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        
+        unfinished = self.unfinished_count()
+        if unfinished:
+            self.log_warning(
+                "⚠️ %d 個任務未完成（尚未交給平台代理的公告下次執行會重試）", unfinished
+            )
+    
+    def unfinished_count(self) -> int:
+        """佇列中與執行中的任務數"""
+        return len(self.active_tasks) + self._task_queue.qsize()
+    
+    async def wait_idle(self):
+        """等待佇列中所有任務（含內容生成與各平台發布）處理完成"""
+        await self._task_queue.join()
+    
+    def _ensure_worker(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker_loop())
+    
+    async def _worker_loop(self):
+        """依序從佇列取出任務並執行"""
+        while True:
+            announcement = await self._task_queue.get()
+            try:
+                await self._run_task(announcement)
+            except Exception as e:
+                self.log_error("任務執行失敗: %s", e)
+            finally:
+                self._task_queue.task_done()
+    
+    def _get_content_agent(self) -> Optional[BaseAgent]:
+        """取得並快取 ContentAgent 參考（MotherAgent 建立時它可能尚未註冊）"""
+        if self._content_agent is None:
+            self._content_agent = self.message_bus.agents.get("ContentAgent")
+        return self._content_agent
     
     def _setup_handlers(self):
         """設定訊息處理器"""
@@ -164,8 +230,12 @@ class MotherAgent(BaseAgent):
             self.log_error("收到無效的任務")
             return
         
-        self.log_info(f"📋 收到任務: {announcement.title[:40]}...")
-        
+        self.log_info("📋 收到任務: %s...", announcement.title[:40])
+        self._ensure_worker()
+        await self._task_queue.put(announcement)
+    
+    async def _run_task(self, announcement: AwardAnnouncement):
+        """執行單一任務：記錄並分配給 ContentAgent"""
         # 記錄活動任務
         task_id = announcement.id
         self.active_tasks[task_id] = {
@@ -178,15 +248,38 @@ class MotherAgent(BaseAgent):
         self.results_buffer[task_id] = {}
         
         # Step 1: 分配給 Content Agent 生成內容
-        self.log_info(f"📝 分配給 ContentAgent 生成內容...")
-        await self.send_message(
-            receiver="ContentAgent",
-            msg_type=MessageType.TASK_ASSIGNMENT,
-            payload={
-                'announcement': announcement,
-                'task_id': task_id
-            }
-        )
+        self.log_info("📝 分配給 ContentAgent 生成內容...")
+        task_payload = {
+            'announcement': announcement,
+            'task_id': task_id
+        }
+        content_agent = self._get_content_agent()
+        if content_agent is not None:
+            await self.send_to(content_agent, MessageType.TASK_ASSIGNMENT, task_payload)
+        else:
+            await self.send_message(
+                receiver="ContentAgent",
+                msg_type=MessageType.TASK_ASSIGNMENT,
+                payload=task_payload
+            )
+        
+        # 訊息都在呼叫端直接處理，回到這裡時內容生成和各平台發布都已結束
+        task = self.active_tasks.get(task_id)
+        if task is None:
+            return
+        if task['status'] != 'posting':
+            self.log_warning("⚠️ 內容生成失敗，未分配發布（下次執行會重試）: %s", task_id)
+            del self.active_tasks[task_id]
+            self.results_buffer.pop(task_id, None)
+            return
+        
+        # 平台處理器發生例外時不會回報結果，視為該平台發布失敗
+        results = self.results_buffer[task_id]
+        for agent_name in self.platform_agents:
+            platform = agent_name.removesuffix('Agent').lower()
+            if platform not in results:
+                results[platform] = PostResult(False, platform, error="未回報發布結果")
+        await self._finalize_task(task_id)
     
     async def _handle_content_generated(self, message: AgentMessage):
         """處理 Content Agent 生成的內容"""
@@ -201,10 +294,10 @@ class MotherAgent(BaseAgent):
         task_id = announcement.id
         
         if task_id not in self.active_tasks:
-            self.log_warning(f"找不到任務: {task_id}")
+            self.log_warning("找不到任務: %s", task_id)
             return
         
-        self.log_info(f"✅ 內容生成完成，開始分配發布任務...")
+        self.log_info("✅ 內容生成完成，開始分配發布任務...")
         
         # 更新任務狀態
         self.active_tasks[task_id]['status'] = 'posting'
@@ -213,23 +306,30 @@ class MotherAgent(BaseAgent):
         # Step 2: 建立 SocialPost 並分配給各平台 Agent
         post = self._create_social_post(announcement, generated_content)
         
-        # 分配給各平台
-        for agent_name in self.platform_agents:
-            self.log_info(f"   📤 分配給 {agent_name}...")
-            
-            await self.send_message(
-                receiver=agent_name,
-                msg_type=MessageType.POST_REQUEST,
-                payload={
-                    'post': post,
-                    'image_url': announcement.image_url,
-                    'task_id': task_id,
-                    'subreddit': 'nycu' if agent_name == 'RedditAgent' else None
-                }
-            )
-            
-            # 短暫延遲避免同時請求
-            await asyncio.sleep(1)
+        # 交給平台代理前先回報，讓公告標記為已處理：之後即使部分平台失敗或逾時中斷，
+        # 下次執行也不會在已發布的平台重複發文
+        await self.send_message(
+            receiver="FatherAgent",
+            msg_type=MessageType.STATUS_UPDATE,
+            payload={
+                'status': 'posting',
+                'announcement_id': task_id
+            }
+        )
+        
+        # 以單一廣播訊息同時分配給各平台（速率限制由各平台代理自行處理）
+        # subreddit 只有 RedditAgent 會讀取
+        self.log_info("   📤 廣播給 %d 個平台代理...", len(self.platform_agents))
+        await self.send_message(
+            receiver=SOCIAL_BROADCAST,
+            msg_type=MessageType.BROADCAST_POST_REQUEST,
+            payload={
+                'post': post,
+                'image_url': announcement.image_url,
+                'task_id': task_id,
+                'subreddit': 'nycu'
+            }
+        )
     
     async def _handle_post_result(self, message: AgentMessage):
         """處理各平台的發布結果"""
@@ -240,30 +340,25 @@ class MotherAgent(BaseAgent):
         if not platform or not result:
             return
         
-        # 找到對應的任務
-        task_id = None
-        for tid, task in self.active_tasks.items():
-            if task['status'] == 'posting':
-                task_id = tid
-                break
+        # 平台代理會回傳 POST_REQUEST 中的 task_id
+        task_id = payload.get('task_id')
+        task = self.active_tasks.get(task_id)
         
-        if not task_id:
-            self.log_warning(f"找不到對應的任務 (platform: {platform})")
+        if task is None:
+            self.log_warning("找不到對應的任務 (platform: %s)", platform)
             return
         
-        # 記錄結果
-        self.results_buffer[task_id][platform] = result
+        # 記錄結果（同一平台重複回報時覆蓋，不重複計數）
+        results = self.results_buffer[task_id]
+        results[platform] = result
         
         if result.success:
-            self.log_info(f"   ✅ {platform}: {result.url}")
+            self.log_info("   ✅ %s: %s", platform, result.url)
         else:
-            self.log_warning(f"   ⚠️ {platform}: {result.error}")
+            self.log_warning("   ⚠️ %s: %s", platform, result.error)
         
         # 檢查是否所有平台都完成了
-        expected_count = len(self.platform_agents)
-        received_count = len(self.results_buffer[task_id])
-        
-        if received_count >= expected_count:
+        if len(results) >= len(self.platform_agents):
             await self._finalize_task(task_id)
     
     async def _finalize_task(self, task_id: str):
@@ -277,10 +372,10 @@ class MotherAgent(BaseAgent):
         success_count = sum(1 for r in results.values() if r.success)
         total_count = len(results)
         
-        self.log_info(f"\n{'='*50}")
-        self.log_info(f"📊 任務完成: {task['announcement'].title[:40]}...")
-        self.log_info(f"   成功: {success_count}/{total_count} 個平台")
-        self.log_info(f"{'='*50}\n")
+        self.log_info("\n%s", _BANNER)
+        self.log_info("📊 任務完成: %s...", task['announcement'].title[:40])
+        self.log_info("   成功: %d/%d 個平台", success_count, total_count)
+        self.log_info("%s\n", _BANNER)
         
         # 通知 Father Agent
         status = 'completed' if success_count > 0 else 'failed'
@@ -312,11 +407,11 @@ class MotherAgent(BaseAgent):
         generated_content: GeneratedContent
     ) -> SocialPost:
         """建立 SocialPost 物件"""
-        # 合併 hashtags
-        all_hashtags = list(set(
-            generated_content.hashtags_zh + 
+        # 合併 hashtags（去除重複並保留原本順序）
+        all_hashtags = list(dict.fromkeys(itertools.chain(
+            generated_content.hashtags_zh,
             generated_content.hashtags_en
-        ))
+        )))
         
         return SocialPost(
             title=announcement.title,
@@ -330,4 +425,4 @@ class MotherAgent(BaseAgent):
     
     async def handle_message(self, message: AgentMessage):
         """處理其他訊息"""
-        self.log_info(f"收到訊息: {message.msg_type.value} 來自 {message.sender}")
+        self.log_info("收到訊息: %s 來自 %s", message.msg_type.value, message.sender)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共用 HTTP 連線
+所有代理（經由 BaseAgent._get_http）共用同一個 aiohttp ClientSession，
+跨請求保留連線池和 TLS 連線；由 AgentOrchestrator.stop() 關閉
+"""
+from typing import Optional
+
+import aiohttp
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """取得共用的 ClientSession（第一次使用時建立，需在事件迴圈中呼叫）"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            ),
+            timeout=aiohttp.ClientTimeout(total=60, connect=10)
+        )
+    return _session
+
+
+async def close_session():
+    """關閉共用的 ClientSession"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
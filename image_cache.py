@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+圖片下載快取
+同一則公告會發布到多個平台，同一張圖片只下載一次
+"""
+import asyncio
+import atexit
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import aiohttp
+
+# 大圖片的暫存目錄：預設為系統暫存目錄 (None)；
+# 設定環境變數 NYCU_BOT_IMAGE_TMPFS=1 且 /dev/shm 可寫入時改用 tmpfs，暫存檔不經過磁碟
+SPOOL_IN_MEMORY = (
+    os.environ.get('NYCU_BOT_IMAGE_TMPFS') == '1'
+    and os.path.isdir('/dev/shm')
+    and os.access('/dev/shm', os.W_OK)
+)
+SPOOL_DIR = '/dev/shm' if SPOOL_IN_MEMORY else None
+
+_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(slots=True)
+class CachedImage:
+    """
+    快取的圖片：小圖片內容在 data，大圖片存成暫存檔 path
+    ImageCache.fetch() 回傳的圖片由呼叫者持有，用完須 release()（或以 with 使用）；
+    持有期間即使被移出快取，暫存檔也會保留到最後一個持有者釋放後才刪除
+    """
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    _users: int = field(default=0, init=False, repr=False)
+    _evicted: bool = field(default=False, init=False, repr=False)
+
+    def payload(self) -> Union[bytes, BinaryIO]:
+        """取得上傳用的 body（暫存檔每次開啟新的檔案物件，由 aiohttp 串流後關閉）"""
+        if self.path is None:
+            return self.data
+        return open(self.path, 'rb')
+
+    def release(self):
+        """結束使用"""
+        self._users -= 1
+        if self._evicted and not self._users:
+            self._unlink()
+
+    def __enter__(self) -> 'CachedImage':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _evict(self):
+        """移出快取：沒有持有者時立即刪除暫存檔，否則等最後一個持有者釋放"""
+        self._evicted = True
+        if not self._users:
+            self._unlink()
+
+    def _unlink(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class ImageCache:
+    """
+    以網址為鍵的 LRU 圖片快取，項目在 ttl 秒後過期
+    過期項目保留 ETag / Last-Modified，重新取得時以條件式 GET 驗證，未變更 (304) 就沿用原內容
+    同一網址同時只會有一個下載，其他呼叫者等待同一個結果
+    超過 max_item_mb 的圖片邊下載邊寫入 SPOOL_DIR 的暫存檔，快取檔案路徑而不是內容；
+    暫存檔過期即刪除，在 tmpfs (SPOOL_IN_MEMORY) 時計入記憶體上限，否則計入 max_disk_mb
+    """
+
+    def __init__(
+        self,
+        max_size_mb: int = 50,
+        ttl: float = 600,
+        max_item_mb: int = 5,
+        max_disk_mb: int = 200
+    ):
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_item_size = max_item_mb * 1024 * 1024
+        self.max_disk_size = max_disk_mb * 1024 * 1024
+        self.ttl = ttl
+        # 網址 -> (圖片, 到期時間, ETag, Last-Modified)
+        self._items: OrderedDict[str, Tuple[CachedImage, float, Optional[str], Optional[str]]] = OrderedDict()
+        self._size = 0
+        self._disk_size = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def get(self, url: str) -> Optional[CachedImage]:
+        """取得未過期的快取內容（過期項目仍保留，供條件式 GET 使用）"""
+        entry = self._items.get(url)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        self._items.move_to_end(url)
+        return entry[0]
+
+    def put(
+        self,
+        url: str,
+        image: CachedImage,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ):
+        """存入快取，超過記憶體或暫存檔總量時移除最久未使用的項目"""
+        if url in self._items:
+            self._remove(url, keep=image)
+        self._purge_expired_files()
+        self._items[url] = (image, time.monotonic() + self.ttl, etag, last_modified)
+        if self._on_disk(image):
+            self._disk_size += image.size
+        else:
+            self._size += image.size
+
+        # 最新的項目不移除，即使它本身就超過上限
+        for old_url in list(self._items)[:-1]:
+            mem_over = self._size > self.max_size
+            disk_over = self._disk_size > self.max_disk_size
+            if not (mem_over or disk_over):
+                break
+            if disk_over if self._on_disk(self._items[old_url][0]) else mem_over:
+                self._remove(old_url)
+
+    @staticmethod
+    def _on_disk(image: CachedImage) -> bool:
+        """是否計入暫存檔上限（tmpfs 上的暫存檔佔用記憶體，計入記憶體上限）"""
+        return image.path is not None and not SPOOL_IN_MEMORY
+
+    def _remove(self, url: str, keep: Optional[CachedImage] = None):
+        image = self._items.pop(url)[0]
+        if self._on_disk(image):
+            self._disk_size -= image.size
+        else:
+            self._size -= image.size
+        if image is not keep:
+            image._evict()
+
+    def _purge_expired_files(self):
+        """過期的暫存檔不保留給條件式 GET，直接刪除"""
+        now = time.monotonic()
+        expired = [
+            url for url, (image, expires_at, _, _) in self._items.items()
+            if image.path is not None and expires_at <= now
+        ]
+        for url in expired:
+            self._remove(url)
+
+    async def fetch(self, url: str, session: aiohttp.ClientSession) -> CachedImage:
+        """
+        取得圖片：先查快取，沒有時下載（同一網址的同時請求共用一個下載）
+        回傳的圖片已由呼叫者持有，用完須 release()
+        """
+        self._purge_expired_files()
+        while True:
+            image = self.get(url)
+            if image is None:
+                task = self._inflight.get(url)
+                if task is None:
+                    task = asyncio.create_task(self._download(url, session))
+                    self._inflight[url] = task
+                    task.add_done_callback(lambda t: self._on_download_done(url, t))
+                # 個別呼叫者被取消時不影響其他等待同一下載的呼叫者
+                image = await asyncio.shield(task)
+                if image._evicted and image.path is not None:
+                    # 等待期間暫存檔已被移出快取並刪除，重新取得
+                    continue
+            # 取得與持有之間沒有 await，持有前不會被其他工作刪除
+            image._users += 1
+            return image
+
+    def _on_download_done(self, url: str, task: asyncio.Task):
+        self._inflight.pop(url, None)
+        if not task.cancelled():
+            task.exception()  # 所有等待者都已取消時，避免「例外未被取出」警告
+
+    async def _download(self, url: str, session: aiohttp.ClientSession) -> CachedImage:
+        headers = {}
+        stale = self._items.get(url)
+        if stale is not None:
+            _, _, etag, last_modified = stale
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        async with session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=30),
+            raise_for_status=True
+        ) as response:
+            if response.status == 304 and stale is not None:
+                # 圖片未變更，沿用快取內容並延長期限
+                image, _, etag, last_modified = stale
+            else:
+                image = await self._read_body(url, response)
+                etag = last_modified = None
+            etag = response.headers.get('ETag', etag)
+            last_modified = response.headers.get('Last-Modified', last_modified)
+            # 讀完立即存入（不經過 await），取消時不會留下未登記的暫存檔
+            self.put(url, image, etag, last_modified)
+        return image
+
+    async def _read_body(self, url: str, response: aiohttp.ClientResponse) -> CachedImage:
+        """讀取回應內容：不超過 max_item_size 時保留在記憶體，超過後改寫入暫存檔"""
+        buffer = bytearray()
+        tmp = None
+        try:
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                if tmp is not None:
+                    tmp.write(chunk)
+                    continue
+                buffer += chunk
+                if len(buffer) > self.max_item_size:
+                    ext = os.path.splitext(urlparse(url).path)[1].lower()
+                    tmp = tempfile.NamedTemporaryFile(
+                        delete=False,
+                        suffix=ext if ext in _IMAGE_EXTS else '.jpg',
+                        dir=SPOOL_DIR
+                    )
+                    tmp.write(buffer)
+                    buffer = None
+        except BaseException:
+            if tmp is not None:
+                tmp.close()
+                os.remove(tmp.name)
+            raise
+
+        if tmp is None:
+            return CachedImage(size=len(buffer), data=bytes(buffer))
+        size = tmp.tell()
+        tmp.close()
+        return CachedImage(size=size, path=tmp.name)
+
+    def clear(self):
+        """清除所有快取（並刪除沒有持有者的暫存檔）"""
+        for image, _, _, _ in self._items.values():
+            image._evict()
+        self._items.clear()
+        self._size = 0
+        self._disk_size = 0
+
+
+# 全程式共用的圖片快取
+image_cache = ImageCache()
+atexit.register(image_cache.clear)
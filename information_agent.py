@@ -5,12 +5,14 @@ Information Agent
 負責監控 NYCU AI 網站並抓取獲獎公告
 """
 import asyncio
+import re
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional, Set, Tuple
 from urllib.parse import unquote
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 
 from models import AwardAnnouncement, AgentMessage, MessageType
 from base_agent import BaseAgent
@@ -23,10 +25,20 @@ class InformationAgent(BaseAgent):
     負責從網站抓取獲獎公告並通知 Father Agent
     """
     
+    # 抓圖片時先讀取的頁面位元組數
+    IMAGE_PREFIX_BYTES = 64 * 1024
+    # 抓取網頁的逾時
+    REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+    
     def __init__(self):
         super().__init__("InformationAgent")
         self.base_url = "https://ai.nycu.edu.tw/category/hot-news/"
         self.tracker = ProcessedTracker()
+        # 已通知但尚未交給平台代理發布的公告，交出後才標記為已處理
+        self._pending_ids: Set[str] = set()
+        # 已交給平台代理、等待寫入 tracker 的公告（flush_processed() 一次寫入）
+        self._finished_ids: Set[str] = set()
+        self._fetch_semaphore = asyncio.Semaphore(8)
         
         # 獲獎相關關鍵字
         self.award_keywords = [
@@ -35,60 +47,109 @@ class InformationAgent(BaseAgent):
             '優等', '特優', '佳作', '優勝', '表揚', '殊榮', '榮譽',
             '最佳', '傑出', '優秀'
         ]
+        # 所有關鍵字編譯成單一正規表示式，一次掃描即可判斷
+        self._award_re = re.compile('|'.join(map(re.escape, self.award_keywords)))
+    
+    def _setup_handlers(self):
+        """設定訊息處理器"""
+        self.register_handler(
+            MessageType.STATUS_UPDATE,
+            self._handle_status_update
+        )
+    
+    async def _handle_status_update(self, message: AgentMessage):
+        """公告交給各平台代理發布後才標記為已處理（之後不論各平台結果都不再重新發布）"""
+        payload = message.payload
+        self.log_info("收到狀態更新: %s", payload)
+        
+        announcement_id = payload.get('announcement_id')
+        if payload.get('status') == 'posting' and announcement_id:
+            self._pending_ids.discard(announcement_id)
+            self._finished_ids.add(announcement_id)
+    
+    def flush_processed(self):
+        """將本次執行已交出的公告一次寫入 tracker"""
+        if self._finished_ids:
+            self.tracker.mark_processed_bulk(self._finished_ids)
+            self._finished_ids.clear()
+    
+    async def close(self):
+        """寫入尚未儲存的已處理公告"""
+        self.flush_processed()
+        await super().close()
     
     async def handle_message(self, message: AgentMessage):
         """處理接收到的訊息"""
-        if message.msg_type == MessageType.STATUS_UPDATE:
-            self.log_info(f"收到狀態更新: {message.payload}")
+        self.log_info("收到訊息: %s 來自 %s", message.msg_type.value, message.sender)
     
     def _is_award_announcement(self, title: str, content: str = "") -> bool:
-        """判斷是否為獲獎公告"""
-        text_to_check = title + " " + content
-        return any(keyword in text_to_check for keyword in self.award_keywords)
+        """判斷是否為獲獎公告（先檢查標題，標題命中就不必掃描內容）"""
+        if self._award_re.search(title):
+            return True
+        return bool(content) and self._award_re.search(content) is not None
+    
+    def _extract_image_url(self, tree: LexborHTMLParser) -> Optional[str]:
+        """從解析後的頁面找出文章內容中的第一張圖片"""
+        content_area = (
+            tree.css_first('div.entry-content') or 
+            tree.css_first('article')
+        )
+        
+        if content_area:
+            # 優先找 img 標籤
+            img = content_area.css_first('img')
+            if img and img.attributes.get('src'):
+                img_url = img.attributes['src']
+                if not img_url.startswith('http'):
+                    img_url = f"https://ai.nycu.edu.tw{img_url}"
+                return img_url
+            
+            # 備選：找 figure 中的圖片
+            figure = content_area.css_first('figure')
+            if figure:
+                img = figure.css_first('img')
+                if img and img.attributes.get('src'):
+                    img_url = img.attributes['src']
+                    if not img_url.startswith('http'):
+                        img_url = f"https://ai.nycu.edu.tw{img_url}"
+                    return img_url
+        
+        return None
     
     async def _fetch_image_from_page(
         self,
         session: aiohttp.ClientSession,
         url: str
     ) -> Optional[str]:
-        """從公告頁面抓取圖片"""
+        """從公告頁面抓取圖片（先只讀取頁面開頭，開頭未含內文圖片時才讀完整頁面，結果與完整解析相同）"""
         try:
-            async with session.get(url, timeout=30) as response:
+            async with session.get(url, timeout=self.REQUEST_TIMEOUT) as response:
                 if response.status != 200:
                     return None
                 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
+                # 圖片通常在文章開頭，先解析前 64KB
+                html = bytearray()
+                async for chunk in response.content.iter_chunked(8192):
+                    html += chunk
+                    if len(html) >= self.IMAGE_PREFIX_BYTES:
+                        break
                 
-                # 尋找文章內容中的圖片
-                content_area = (
-                    soup.find('div', class_='entry-content') or 
-                    soup.find('article')
-                )
+                tree = LexborHTMLParser(bytes(html))
+                if response.content.at_eof():
+                    return self._extract_image_url(tree)
                 
-                if content_area:
-                    # 優先找 img 標籤
-                    img = content_area.find('img')
-                    if img and img.get('src'):
-                        img_url = img['src']
-                        if not img_url.startswith('http'):
-                            img_url = f"https://ai.nycu.edu.tw{img_url}"
+                # 只有前段已包含 div.entry-content 且找到圖片時才採用；
+                # 否則會退回 <article>，可能取到內文之前的特色圖片或頭像，與完整解析結果不同
+                if tree.css_first('div.entry-content') is not None:
+                    img_url = self._extract_image_url(tree)
+                    if img_url:
                         return img_url
-                    
-                    # 備選：找 figure 中的圖片
-                    figure = content_area.find('figure')
-                    if figure:
-                        img = figure.find('img')
-                        if img and img.get('src'):
-                            img_url = img['src']
-                            if not img_url.startswith('http'):
-                                img_url = f"https://ai.nycu.edu.tw{img_url}"
-                            return img_url
                 
-                return None
+                html += await response.content.read()
+                return self._extract_image_url(LexborHTMLParser(bytes(html)))
                 
         except Exception as e:
-            self.log_error(f"抓取圖片失敗 {url}: {e}")
+            self.log_error("抓取圖片失敗 %s: %s", url, e)
             return None
     
     async def _fetch_full_content(
@@ -98,132 +159,176 @@ class InformationAgent(BaseAgent):
     ) -> str:
         """從公告頁面抓取完整內容"""
         try:
-            async with session.get(url, timeout=30) as response:
+            async with session.get(url, timeout=self.REQUEST_TIMEOUT) as response:
                 if response.status != 200:
                     return ""
                 
                 html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
+                tree = LexborHTMLParser(html)
                 
-                content_area = soup.find('div', class_='entry-content')
+                content_area = tree.css_first('div.entry-content')
                 if content_area:
                     # 移除腳本和樣式
-                    for script in content_area(['script', 'style']):
+                    for script in content_area.css('script, style'):
                         script.decompose()
                     
                     # 取得純文字
-                    text = content_area.get_text(separator='\n', strip=True)
+                    text = content_area.text(separator='\n', strip=True, skip_empty=True)
                     return text[:1000]  # 限制長度
                 
                 return ""
                 
         except Exception as e:
-            self.log_error(f"抓取內容失敗 {url}: {e}")
+            self.log_error("抓取內容失敗 %s: %s", url, e)
             return ""
     
+    async def _fetch_details(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        need_content: bool
+    ) -> Tuple[str, Optional[str]]:
+        """抓取公告頁面的完整內容（需要時）和圖片，限制同時抓取的頁面數"""
+        async with self._fetch_semaphore:
+            if need_content:
+                full_content, image_url = await asyncio.gather(
+                    self._fetch_full_content(session, url),
+                    self._fetch_image_from_page(session, url)
+                )
+                return full_content, image_url
+            return "", await self._fetch_image_from_page(session, url)
+    
+    def _iter_award_candidates(
+        self,
+        articles
+    ) -> Iterator[Tuple[str, str, str, datetime]]:
+        """
+        逐篇解析列表頁文章，只產出獲獎公告候選 (標題, 網址, 摘要, 發布日期)
+        非獲獎文章在判斷後立即跳過，不再解析網址和日期
+        """
+        for article in articles:
+            try:
+                # 提取標題
+                h2 = article.css_first('h2.entry-title')
+                if not h2:
+                    continue
+                
+                link = h2.css_first('a')
+                if not link:
+                    continue
+                
+                title = link.text(strip=True)
+                
+                # 提取內容摘要
+                content = ""
+                summary_div = article.css_first('div.entry-summary')
+                if summary_div:
+                    content = summary_div.text(strip=True)
+                else:
+                    content_div = article.css_first('div.entry-content')
+                    if content_div:
+                        content = content_div.text(strip=True)
+                
+                # 檢查是否為獲獎公告
+                if not self._is_award_announcement(title, content):
+                    self.log_info("跳過非獲獎公告: %s...", title[:30])
+                    continue
+                
+                self.log_info("🎉 發現獲獎公告: %s", title)
+                url = unquote(link.attributes.get('href') or '')
+                
+                # 提取日期
+                date_published = datetime.now()
+                time_element = article.css_first('time.entry-date.published')
+                if time_element:
+                    datetime_str = time_element.attributes.get('datetime') or ''
+                    try:
+                        if datetime_str:
+                            dt = datetime.fromisoformat(
+                                datetime_str.replace('+08:00', '')
+                            )
+                            date_published = dt
+                    except:
+                        pass
+                
+                yield title, url, content, date_published
+                
+            except Exception as e:
+                self.log_error("處理文章失敗: %s", e)
+                continue
+    
     async def scan_for_announcements(self) -> List[AwardAnnouncement]:
         """掃描網站獲取獲獎公告"""
         self.log_info("🔍 開始掃描獲獎公告...")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, timeout=30) as response:
-                    if response.status != 200:
-                        self.log_error(f"無法訪問網站: {response.status}")
-                        return []
-                    
-                    html = await response.text()
+            session = await self._get_http()
+            async with session.get(self.base_url, timeout=self.REQUEST_TIMEOUT) as response:
+                if response.status != 200:
+                    self.log_error("無法訪問網站: %s", response.status)
+                    return []
+                
+                html = await response.text()
+            
+            tree = LexborHTMLParser(html)
+            announcements = []
+            
+            # 找所有文章
+            articles = tree.css('article')
+            self.log_info("找到 %d 篇文章", len(articles))
+            
+            # 第一階段：解析列表頁，篩選出獲獎公告候選（檢查最新10篇）
+            candidates = list(self._iter_award_candidates(articles[:10]))
+            
+            # 第二階段：同時抓取各公告的完整內容和圖片
+            details = await asyncio.gather(
+                *(
+                    self._fetch_details(session, url, not content or len(content) < 50)
+                    for _, url, content, _ in candidates
+                ),
+                return_exceptions=True
+            )
+            
+            for (title, url, content, date_published), detail in zip(candidates, details):
+                if isinstance(detail, Exception):
+                    self.log_error("處理文章失敗: %s", detail)
+                    continue
                 
-                soup = BeautifulSoup(html, 'html.parser')
-                announcements = []
+                full_content, image_url = detail
                 
-                # 找所有文章
-                articles = soup.find_all('article')
-                self.log_info(f"找到 {len(articles)} 篇文章")
+                # 摘要過短時改用完整內容
+                if not content or len(content) < 50:
+                    content = full_content or title
                 
-                for article in articles[:10]:  # 檢查最新10篇
-                    try:
-                        # 提取標題和URL
-                        h2 = article.find('h2', class_='entry-title')
-                        if not h2:
-                            continue
-                        
-                        link = h2.find('a')
-                        if not link:
-                            continue
-                        
-                        title = link.get_text(strip=True)
-                        url = unquote(link.get('href', ''))
-                        
-                        # 提取內容摘要
-                        content = ""
-                        summary_div = article.find('div', class_='entry-summary')
-                        if summary_div:
-                            content = summary_div.get_text(strip=True)
-                        elif article.find('div', class_='entry-content'):
-                            content = article.find('div', class_='entry-content').get_text(strip=True)
-                        
-                        # 檢查是否為獲獎公告
-                        if not self._is_award_announcement(title, content):
-                            self.log_info(f"跳過非獲獎公告: {title[:30]}...")
-                            continue
-                        
-                        self.log_info(f"🎉 發現獲獎公告: {title}")
-                        
-                        # 抓取完整內容
-                        if not content or len(content) < 50:
-                            full_content = await self._fetch_full_content(session, url)
-                            if full_content:
-                                content = full_content
-                            else:
-                                content = title
-                        
-                        # 提取日期
-                        date_published = datetime.now()
-                        time_element = article.find('time', class_='entry-date published')
-                        if time_element:
-                            datetime_str = time_element.get('datetime', '')
-                            try:
-                                if datetime_str:
-                                    dt = datetime.fromisoformat(
-                                        datetime_str.replace('+08:00', '')
-                                    )
-                                    date_published = dt
-                            except:
-                                pass
-                        
-                        # 抓取圖片
-                        image_url = await self._fetch_image_from_page(session, url)
-                        if image_url:
-                            self.log_info(f"   找到圖片: {image_url[:60]}...")
-                        
-                        # 建立獲獎公告物件
-                        announcement = AwardAnnouncement(
-                            id="",
-                            title=title,
-                            content=content,
-                            url=url,
-                            date=date_published,
-                            image_url=image_url
-                        )
-                        announcement.id = announcement.generate_id()
-                        
-                        # 檢查是否已處理過
-                        if self.tracker.is_processed(announcement.id):
-                            self.log_info(f"   已處理過，跳過")
-                            continue
-                        
-                        announcements.append(announcement)
-                        
-                    except Exception as e:
-                        self.log_error(f"處理文章失敗: {e}")
-                        continue
+                if image_url:
+                    self.log_info("   找到圖片: %s...", image_url[:60])
                 
-                self.log_info(f"✅ 找到 {len(announcements)} 個新獲獎公告")
-                return announcements
+                # 建立獲獎公告物件
+                announcement = AwardAnnouncement(
+                    id="",
+                    title=title,
+                    content=content,
+                    url=url,
+                    date=date_published,
+                    image_url=image_url
+                )
+                announcement.id = announcement.generate_id()
+                
+                # 檢查是否已處理過（或已通知、仍在處理中）
+                if self.tracker.is_processed(announcement.id):
+                    self.log_info("   已處理過，跳過")
+                    continue
+                if announcement.id in self._pending_ids or announcement.id in self._finished_ids:
+                    self.log_info("   處理中，跳過")
+                    continue
                 
+                announcements.append(announcement)
+            
+            self.log_info("✅ 找到 %d 個新獲獎公告", len(announcements))
+            return announcements
+            
         except Exception as e:
-            self.log_error(f"掃描公告失敗: {e}")
+            self.log_error("掃描公告失敗: %s", e)
             return []
     
     async def check_and_notify(self):
@@ -234,8 +339,11 @@ class InformationAgent(BaseAgent):
             self.log_info("沒有發現新的獲獎公告")
             return
         
+        # MotherAgent 只會將任務排入佇列，這裡不標記為已處理；
+        # 等 FatherAgent 轉回「已交給平台代理」的狀態才標記，尚未發布的公告下次執行會重試
         for announcement in announcements:
-            self.log_info(f"📤 通知 FatherAgent: {announcement.title[:40]}...")
+            self.log_info("📤 通知 FatherAgent: %s...", announcement.title[:40])
+            self._pending_ids.add(announcement.id)
             
             # 發送訊息給 Father Agent
             await self.send_message(
@@ -243,27 +351,22 @@ class InformationAgent(BaseAgent):
                 msg_type=MessageType.NEW_ANNOUNCEMENT,
                 payload={
                     'announcement': announcement,
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
                 }
             )
-            
-            # 標記為已處理
-            self.tracker.mark_processed(announcement.id)
-            
-            # 短暫延遲避免過快
-            await asyncio.sleep(1)
     
     async def run_continuous(self, interval_minutes: int = 30):
         """持續監控模式"""
-        self.log_info(f"🔄 開始持續監控 (間隔: {interval_minutes} 分鐘)")
+        self.log_info("🔄 開始持續監控 (間隔: %s 分鐘)", interval_minutes)
         
         while True:
             try:
                 await self.check_and_notify()
-                self.log_info(f"⏰ {interval_minutes} 分鐘後再次檢查...")
+                self.log_info("⏰ %s 分鐘後再次檢查...", interval_minutes)
                 await asyncio.sleep(interval_minutes * 60)
             except asyncio.CancelledError:
+                await self.close()
                 break
             except Exception as e:
-                self.log_error(f"監控錯誤: {e}")
+                self.log_error("監控錯誤: %s", e)
                 await asyncio.sleep(60)  # 錯誤後等待1分鐘重試
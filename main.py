@@ -48,11 +48,15 @@ from content_agent import ContentAgent
 from social_agents_part1 import TwitterAgent, FacebookAgent, InstagramAgent
 from social_agents_part2 import LinkedInAgent, RedditAgent
 from config import Config
+from http_client import close_session
 
 
 class MultiAgentSystem:
     """Multi-Agent 系統主類別"""
     
+    # 每則公告等待發布流程完成的上限（秒），另加上 Twitter 的發文間隔
+    COMPLETION_TIMEOUT = 180
+    
     def __init__(self):
         self.orchestrator = AgentOrchestrator()
         self.agents = {}
@@ -95,12 +99,13 @@ class MultiAgentSystem:
         # 讓 InformationAgent 檢查並通知
         await self.agents['information'].check_and_notify()
         
-        # 等待處理完成（給予足夠時間）
+        # 等待處理完成
         logger.info("⏳ 等待任務處理完成...")
-        await asyncio.sleep(60)  # 根據需要調整
+        await self._wait_for_completion()
         
         # 停止系統
         await self.orchestrator.stop()
+        self.agents['information'].flush_processed()
         
         logger.info("\n✅ 單次執行完成\n")
     
@@ -126,13 +131,16 @@ class MultiAgentSystem:
         # 啟動協調器
         await self.orchestrator.start()
         
+        loop = asyncio.get_running_loop()
         try:
             while True:
+                started = loop.time()
+                
                 # 執行檢查
                 await self.agents['information'].check_and_notify()
                 
                 # 等待處理完成
-                await asyncio.sleep(120)  # 2 分鐘內完成所有發布
+                await self._wait_for_completion()
                 
                 # 顯示下次檢查時間
                 next_check = datetime.now()
@@ -141,15 +149,37 @@ class MultiAgentSystem:
                     f"{interval_minutes} 分鐘後再次檢查...\n"
                 )
                 
-                # 等待下次檢查
-                await asyncio.sleep((interval_minutes - 2) * 60)
+                # 等待下次檢查（扣除本次處理花費的時間）
+                await asyncio.sleep(max(0, interval_minutes * 60 - (loop.time() - started)))
                 
         except KeyboardInterrupt:
             logger.info("\n\n🛑 收到停止信號...")
         finally:
             await self.orchestrator.stop()
+            self.agents['information'].flush_processed()
             logger.info("✅ 系統已停止")
     
+    async def _wait_for_completion(self):
+        """
+        等待 MotherAgent 處理完所有任務
+        任務依序執行，每則推文之間 TwitterAgent 會等待 _min_interval 秒，
+        所以每個任務的上限是 COMPLETION_TIMEOUT 加上一個推文間隔
+        """
+        mother = self.agents['mother']
+        timeout = max(mother.unfinished_count(), 1) * (
+            self.COMPLETION_TIMEOUT + TwitterAgent._min_interval
+        )
+        try:
+            await asyncio.wait_for(mother.wait_idle(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"⚠️ 等待任務完成逾時 ({timeout} 秒)，"
+                "尚未交給平台代理的公告下次執行會重試"
+            )
+        finally:
+            # 本輪已交給平台代理的公告一次寫入
+            self.agents['information'].flush_processed()
+    
     async def test_content_generation(self):
         """測試內容生成功能"""
         from models import AwardAnnouncement
@@ -193,6 +223,34 @@ class MultiAgentSystem:
             logger.error("❌ 內容生成失敗")
 
 
+# 互動設定的各平台憑證欄位：(設定區段, 標題, [(欄位, 提示文字), ...])
+CREDENTIAL_SCHEMA = [
+    ('facebook', "📘 Facebook 設定:", [
+        ('page_id', "Page ID"),
+        ('access_token', "Access Token"),
+    ]),
+    ('instagram', "\n📷 Instagram 設定:", [
+        ('access_token', "Access Token"),
+        ('instagram_account_id', "Instagram Account ID"),
+    ]),
+    ('twitter', "\n🐦 Twitter/X 設定:", [
+        ('api_key', "API Key"),
+        ('api_secret', "API Secret"),
+        ('access_token', "Access Token"),
+        ('access_token_secret', "Access Token Secret"),
+    ]),
+    ('reddit', "\n🤖 Reddit 設定:", [
+        ('client_id', "Client ID"),
+        ('client_secret', "Client Secret"),
+        ('username', "Username"),
+        ('password', "Password"),
+    ]),
+    ('linkedin', "\n💼 LinkedIn 設定:", [
+        ('access_token', "Access Token"),
+    ]),
+]
+
+
 def setup_credentials():
     """設定社交媒體憑證"""
     print("\n" + "="*60)
@@ -202,59 +260,31 @@ def setup_credentials():
     config = Config()
     credentials = config.credentials.copy()
     
-    print("📘 Facebook 設定:")
-    print("   (留空跳過)")
-    credentials['facebook'] = {
-        'page_id': input("   Page ID: ") or credentials.get('facebook', {}).get('page_id', ''),
-        'access_token': input("   Access Token: ") or credentials.get('facebook', {}).get('access_token', '')
-    }
-    
-    print("\n📷 Instagram 設定:")
-    print("   (留空跳過)")
-    credentials['instagram'] = {
-        'access_token': input("   Access Token: ") or credentials.get('instagram', {}).get('access_token', ''),
-        'instagram_account_id': input("   Instagram Account ID: ") or credentials.get('instagram', {}).get('instagram_account_id', '')
-    }
-    
-    print("\n🐦 Twitter/X 設定:")
-    print("   (留空跳過)")
-    credentials['twitter'] = {
-        'api_key': input("   API Key: ") or credentials.get('twitter', {}).get('api_key', ''),
-        'api_secret': input("   API Secret: ") or credentials.get('twitter', {}).get('api_secret', ''),
-        'access_token': input("   Access Token: ") or credentials.get('twitter', {}).get('access_token', ''),
-        'access_token_secret': input("   Access Token Secret: ") or credentials.get('twitter', {}).get('access_token_secret', '')
-    }
-    
-    print("\n🤖 Reddit 設定:")
-    print("   (留空跳過)")
-    credentials['reddit'] = {
-        'client_id': input("   Client ID: ") or credentials.get('reddit', {}).get('client_id', ''),
-        'client_secret': input("   Client Secret: ") or credentials.get('reddit', {}).get('client_secret', ''),
-        'username': input("   Username: ") or credentials.get('reddit', {}).get('username', ''),
-        'password': input("   Password: ") or credentials.get('reddit', {}).get('password', ''),
-        'user_agent': 'NYCUBot/1.0'
-    }
-    
-    print("\n💼 LinkedIn 設定:")
-    print("   (留空跳過)")
-    credentials['linkedin'] = {
-        'access_token': input("   Access Token: ") or credentials.get('linkedin', {}).get('access_token', '')
-    }
+    for section, title, fields in CREDENTIAL_SCHEMA:
+        print(title)
+        print("   (留空跳過)")
+        current = credentials.get(section, {})
+        credentials[section] = {
+            key: input(f"   {label}: ") or current.get(key, '')
+            for key, label in fields
+        }
+    credentials['reddit']['user_agent'] = 'NYCUBot/1.0'
     
     print("\n🤖 Ollama 設定:")
     print("   (用於內容生成的本地 LLM)")
-    ollama_url = input(f"   Ollama URL [{credentials.get('ollama', {}).get('base_url', 'http://localhost:11434')}]: ")
-    ollama_model = input(f"   Model [{credentials.get('ollama', {}).get('model', 'deepseek-r1:7b')}]: ")
+    ollama = credentials.get('ollama', {})
+    default_url = ollama.get('base_url', 'http://localhost:11434')
+    default_model = ollama.get('model', 'deepseek-r1:7b')
+    ollama_url = input(f"   Ollama URL [{default_url}]: ")
+    ollama_model = input(f"   Model [{default_model}]: ")
     
     credentials['ollama'] = {
-        'base_url': ollama_url or credentials.get('ollama', {}).get('base_url', 'http://localhost:11434'),
-        'model': ollama_model or credentials.get('ollama', {}).get('model', 'deepseek-r1:7b')
+        'base_url': ollama_url or default_url,
+        'model': ollama_model or default_model
     }
     
-    # 儲存設定
-    import json
-    with open('social_config.json', 'w', encoding='utf-8') as f:
-        json.dump(credentials, f, indent=2, ensure_ascii=False)
+    # 儲存設定（經由 Config 以 orjson 寫入並讓設定快取失效）
+    config._save_config(credentials)
     
     print("\n✅ 憑證已儲存到 social_config.json")
 
@@ -264,7 +294,10 @@ async def test_scan():
     print("\n🧪 測試模式 - 只顯示獲獎公告，不進行發布\n")
     
     info_agent = InformationAgent()
-    announcements = await info_agent.scan_for_announcements()
+    try:
+        announcements = await info_agent.scan_for_announcements()
+    finally:
+        await close_session()
     
     if announcements:
         print(f"\n找到 {len(announcements)} 個獲獎公告:\n")
@@ -339,4 +372,12 @@ async def main():
 
 
 if __name__ == "__main__":
+    # 有 uvloop 時使用 libuv 事件迴圈（Windows 不支援 uvloop）
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    
     asyncio.run(main())
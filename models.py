@@ -5,23 +5,34 @@ NYCU AI Award Announcement Multi-Agent System
 資料模型和共用類別
 """
 import hashlib
+import itertools
+import time
 from datetime import datetime
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Any
 from enum import Enum
 
 
+# 訊息編號產生器（行程內遞增，不需雜湊）
+_msg_counter = itertools.count()
+
+
+# 所有社交平台代理加入的廣播群組名稱
+SOCIAL_BROADCAST = "*social"
+
+
 class MessageType(Enum):
     """代理間訊息類型"""
     NEW_ANNOUNCEMENT = "new_announcement"
     TASK_ASSIGNMENT = "task_assignment"
     CONTENT_GENERATED = "content_generated"
     POST_REQUEST = "post_request"
+    BROADCAST_POST_REQUEST = "broadcast_post_request"
     POST_RESULT = "post_result"
     STATUS_UPDATE = "status_update"
 
 
-@dataclass
+@dataclass(slots=True)
 class AwardAnnouncement:
     """獲獎公告資料結構"""
     id: str
@@ -37,7 +48,7 @@ class AwardAnnouncement:
         return f"award_{self.date.strftime('%Y%m%d')}_{content_hash}"
 
 
-@dataclass
+@dataclass(slots=True)
 class GeneratedContent:
     """LLM 生成的內容"""
     title_zh: str
@@ -49,7 +60,7 @@ class GeneratedContent:
     platform_specific: Dict[str, str] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class SocialPost:
     """社交媒體貼文資料結構"""
     title: str
@@ -61,7 +72,7 @@ class SocialPost:
     generated_content: Optional[GeneratedContent] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PostResult:
     """發文結果"""
     success: bool
@@ -71,14 +82,17 @@ class PostResult:
     error: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentMessage:
     """代理間通訊訊息"""
     msg_type: MessageType
     sender: str
     receiver: str
     payload: Any
-    timestamp: datetime = field(default_factory=datetime.now)
-    message_id: str = field(default_factory=lambda: hashlib.md5(
-        f"{datetime.now().isoformat()}".encode()
-    ).hexdigest()[:12])
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    message_id: str = field(default_factory=lambda: f"{next(_msg_counter):012x}")
+    
+    @property
+    def timestamp(self) -> datetime:
+        """建立時間（需要時才從 timestamp_ns 轉換）"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
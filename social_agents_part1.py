@@ -5,25 +5,34 @@ Social Media Posting Agents
 各社交媒體平台的發文代理
 """
 import asyncio
-import io
-import os
 import tempfile
 import time
 from typing import Optional
 
-import requests
-import tweepy
-from PIL import Image
-
 from models import (
     SocialPost, 
     PostResult, 
     GeneratedContent,
     AgentMessage, 
-    MessageType
+    MessageType,
+    SOCIAL_BROADCAST
 )
 from base_agent import BaseAgent
-from config import Config, encode_image_url
+from config import Config, encode_image_url, to_thread_fast
+
+
+# 推文字數上限
+MAX_TWEET = 280
+
+# JPEG / PNG / GIF 檔頭
+_IMAGE_MAGIC = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a')
+
+
+def _is_known_image(header: bytes) -> bool:
+    """以檔頭判斷是否為常見圖片格式（JPEG、PNG、GIF、WebP）"""
+    return header.startswith(_IMAGE_MAGIC) or (
+        header[:4] == b'RIFF' and header[8:12] == b'WEBP'
+    )
 
 
 class TwitterAgent(BaseAgent):
@@ -31,23 +40,31 @@ class TwitterAgent(BaseAgent):
     
     _last_post_time = None
     _min_interval = 900  # 15分鐘
+    _rate_lock = asyncio.Lock()
+    _SPOOL_MAX_SIZE = 1024 * 1024  # 下載圖片超過此大小才寫入磁碟
     
     def __init__(self):
         super().__init__("TwitterAgent")
         self.config = Config()
+        self._creds = self.config.get('twitter', {})
         self.client = None
         self.api = None
+        self._tweepy = None
         self._init_client()
     
     def _init_client(self):
         """初始化 Twitter 客戶端"""
-        creds = self.config.get('twitter', {})
+        creds = self._creds
         
         if not all(creds.get(k) for k in ['api_key', 'api_secret', 'access_token', 'access_token_secret']):
             self.log_warning("Twitter 憑證不完整")
             return
         
         try:
+            # 有憑證時才載入 tweepy（setup / test 指令不需要）
+            import tweepy
+            self._tweepy = tweepy
+            
             self.client = tweepy.Client(
                 consumer_key=creds.get('api_key'),
                 consumer_secret=creds.get('api_secret'),
@@ -68,9 +85,15 @@ class TwitterAgent(BaseAgent):
         except Exception as e:
             self.log_error(f"Twitter 初始化失敗: {e}")
     
+    async def start(self):
+        """建立 HTTP session 供下載圖片使用"""
+        await self._get_http()
+    
     def _setup_handlers(self):
         """設定訊息處理器"""
         self.register_handler(MessageType.POST_REQUEST, self._handle_post_request)
+        self.register_handler(MessageType.BROADCAST_POST_REQUEST, self._handle_post_request)
+        self.message_bus.join_group(SOCIAL_BROADCAST, self)
     
     async def _handle_post_request(self, message: AgentMessage):
         """處理發文請求"""
@@ -84,7 +107,11 @@ class TwitterAgent(BaseAgent):
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.POST_RESULT,
-            payload={'platform': 'twitter', 'result': result}
+            payload={
+                'platform': 'twitter',
+                'result': result,
+                'task_id': payload.get('task_id')
+            }
         )
     
     async def handle_message(self, message: AgentMessage):
@@ -93,32 +120,43 @@ class TwitterAgent(BaseAgent):
     
     async def post(self, post: SocialPost, image_url: str = None) -> PostResult:
         """發布推文"""
-        if TwitterAgent._last_post_time:
-            elapsed = time.time() - TwitterAgent._last_post_time
-            if elapsed < self._min_interval:
-                wait_time = self._min_interval - elapsed
-                self.log_info(f"⏰ 速率限制保護，等待 {wait_time:.0f} 秒...")
-                await asyncio.sleep(wait_time)
-        
         if not self.client:
             return PostResult(False, "twitter", error="客戶端未初始化")
         
+        # 圖片下載和上傳先在背景開始，與速率限制等待、推文格式化同時進行
+        final_image_url = image_url or post.image_url
+        upload_task = (
+            asyncio.create_task(self._upload_media(final_image_url))
+            if final_image_url else None
+        )
+        
         try:
-            tweet_text = self._format_tweet(post)
-            final_image_url = image_url or post.image_url
-            
-            media_ids = []
-            if final_image_url:
-                media_id = await self._upload_media(final_image_url)
-                if media_id:
-                    media_ids = [media_id]
-            
-            if media_ids:
-                response = self.client.create_tweet(text=tweet_text, media_ids=media_ids)
-            else:
-                response = self.client.create_tweet(text=tweet_text)
-            
-            TwitterAgent._last_post_time = time.time()
+            # 同一時間只有一則推文能檢查並等待速率限制，避免並行呼叫重複等待後同時發文
+            async with TwitterAgent._rate_lock:
+                if TwitterAgent._last_post_time:
+                    elapsed = time.time() - TwitterAgent._last_post_time
+                    if elapsed < self._min_interval:
+                        wait_time = self._min_interval - elapsed
+                        self.log_info(f"⏰ 速率限制保護，等待 {wait_time:.0f} 秒...")
+                        await asyncio.sleep(wait_time)
+                
+                tweet_text = self._format_tweet(post)
+                
+                media_ids = []
+                if upload_task is not None:
+                    media_id = await upload_task
+                    if media_id:
+                        media_ids = [media_id]
+                
+                # tweepy 為同步函式庫，在執行緒中呼叫以免阻塞事件迴圈
+                if media_ids:
+                    response = await to_thread_fast(
+                        self.client.create_tweet, text=tweet_text, media_ids=media_ids
+                    )
+                else:
+                    response = await to_thread_fast(self.client.create_tweet, text=tweet_text)
+                
+                TwitterAgent._last_post_time = time.time()
             
             if response.data:
                 post_id = response.data['id']
@@ -128,52 +166,69 @@ class TwitterAgent(BaseAgent):
             
             return PostResult(False, "twitter", error="無回應資料")
             
-        except tweepy.errors.TooManyRequests as e:
+        except self._tweepy.errors.TooManyRequests as e:
             self.log_error(f"速率限制: {e}")
             return PostResult(False, "twitter", error=f"速率限制: {e}")
         except Exception as e:
             self.log_error(f"發文失敗: {e}")
             return PostResult(False, "twitter", error=str(e))
+        finally:
+            if upload_task is not None and not upload_task.done():
+                upload_task.cancel()
     
     async def _upload_media(self, image_url: str) -> Optional[str]:
         """上傳媒體"""
-        try:
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            image_data = io.BytesIO(response.content)
-            
-            img = Image.open(image_data)
-            img.verify()
-            image_data.seek(0)
-            
-            media = self.api.media_upload(filename="image.jpg", file=image_data)
-            return str(media.media_id)
-            
-        except Exception as e:
-            self.log_error(f"上傳媒體失敗: {e}")
-            return None
+        # 分塊寫入暫存檔，大圖片不必整張保留在記憶體中
+        with tempfile.SpooledTemporaryFile(max_size=self._SPOOL_MAX_SIZE) as image_data:
+            try:
+                session = await self._get_http()
+                async with session.get(image_url, raise_for_status=True) as response:
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        image_data.write(chunk)
+                
+                image_data.seek(0)
+                header = image_data.read(12)
+                image_data.seek(0)
+                
+                # 常見格式只檢查檔頭，其他格式才交給 PIL 驗證
+                if not _is_known_image(header):
+                    from PIL import Image
+                    
+                    img = Image.open(image_data)
+                    img.verify()
+                    image_data.seek(0)
+                
+                media = await to_thread_fast(
+                    self.api.media_upload, filename="image.jpg", file=image_data
+                )
+                return str(media.media_id)
+                
+            except Exception as e:
+                self.log_error(f"上傳媒體失敗: {e}")
+                return None
     
     def _format_tweet(self, post: SocialPost) -> str:
         """格式化推文"""
         content = post.generated_content
         
-        if content and content.platform_specific.get('twitter'):
-            return content.platform_specific['twitter'][:280]
+        if content:
+            twitter_text = content.platform_specific.get('twitter')
+            if twitter_text:
+                return twitter_text[:MAX_TWEET]
         
         hashtags = ' '.join(post.hashtags[:3])
         
         if content and content.title_en:
             text = f"🎉 {content.title_en}"
             if content.content_en:
-                available = 280 - len(hashtags) - len(text) - 10
+                # 保留標題、hashtags 和分隔空行後剩下的字數
+                available = MAX_TWEET - len(hashtags) - len(text) - 10
                 if available > 50:
-                    text += f"\n\n{content.content_en[:available]}"
+                    text = f"{text}\n\n{content.content_en[:available]}"
         else:
             text = f"🎉 {post.title}"
         
-        tweet = f"{text}\n\n{hashtags}"
-        return tweet[:280]
+        return f"{text}\n\n{hashtags}"[:MAX_TWEET]
 
 
 class FacebookAgent(BaseAgent):
@@ -183,9 +238,21 @@ class FacebookAgent(BaseAgent):
         super().__init__("FacebookAgent")
         self.config = Config()
         self.api_url = "https://graph.facebook.com/v21.0"
+        
+        # 憑證和 API 網址在建立時算好，發文時直接使用
+        self._creds = self.config.get('facebook', {})
+        self._has_creds = bool(self._creds.get('page_id') and self._creds.get('access_token'))
+        self._photos_url = f"{self.api_url}/{self._creds.get('page_id')}/photos"
+        self._feed_url = f"{self.api_url}/{self._creds.get('page_id')}/feed"
+    
+    async def start(self):
+        """建立 HTTP session 供 Graph API 使用"""
+        await self._get_http()
     
     def _setup_handlers(self):
         self.register_handler(MessageType.POST_REQUEST, self._handle_post_request)
+        self.register_handler(MessageType.BROADCAST_POST_REQUEST, self._handle_post_request)
+        self.message_bus.join_group(SOCIAL_BROADCAST, self)
     
     async def _handle_post_request(self, message: AgentMessage):
         payload = message.payload
@@ -197,15 +264,18 @@ class FacebookAgent(BaseAgent):
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.POST_RESULT,
-            payload={'platform': 'facebook', 'result': result}
+            payload={
+                'platform': 'facebook',
+                'result': result,
+                'task_id': payload.get('task_id')
+            }
         )
     
     async def handle_message(self, message: AgentMessage):
         pass
     
     def _has_credentials(self) -> bool:
-        creds = self.config.get('facebook', {})
-        return bool(creds.get('page_id') and creds.get('access_token'))
+        return self._has_creds
     
     async def post(self, post: SocialPost, image_url: str = None) -> PostResult:
         """發布 Facebook 貼文"""
@@ -213,36 +283,36 @@ class FacebookAgent(BaseAgent):
             return PostResult(False, "facebook", error="憑證不完整")
         
         try:
-            creds = self.config.get('facebook', {})
             post_content = self._format_post(post)
             final_image_url = image_url or post.image_url
             
             if final_image_url:
-                return await self._post_with_photo(post_content, final_image_url, creds)
+                return await self._post_with_photo(post_content, final_image_url)
             else:
-                return await self._post_text(post_content, creds)
+                return await self._post_text(post_content)
                 
         except Exception as e:
             self.log_error(f"發文失敗: {e}")
             return PostResult(False, "facebook", error=str(e))
     
-    async def _post_with_photo(self, caption: str, image_url: str, creds: dict) -> PostResult:
+    async def _post_with_photo(self, caption: str, image_url: str) -> PostResult:
         encoded_url = encode_image_url(image_url)
         
-        url = f"{self.api_url}/{creds['page_id']}/photos"
         params = {
             'url': encoded_url,
             'caption': caption,
-            'access_token': creds['access_token']
+            'access_token': self._creds['access_token']
         }
         
-        response = requests.post(url, data=params)
+        session = await self._get_http()
+        async with session.post(self._photos_url, data=params) as response:
+            data = await response.json(content_type=None)
         
-        if response.status_code != 200:
-            error = response.json().get('error', {}).get('message', '未知錯誤')
+        if response.status != 200:
+            error = data.get('error', {}).get('message', '未知錯誤')
             return PostResult(False, "facebook", error=error)
         
-        post_id = response.json().get('id')
+        post_id = data.get('id')
         if post_id:
             post_url = f"https://www.facebook.com/photo.php?fbid={post_id}"
             self.log_info(f"✅ Facebook 發布成功: {post_url}")
@@ -250,20 +320,21 @@ class FacebookAgent(BaseAgent):
         
         return PostResult(False, "facebook", error="發布失敗")
     
-    async def _post_text(self, message: str, creds: dict) -> PostResult:
-        url = f"{self.api_url}/{creds['page_id']}/feed"
+    async def _post_text(self, message: str) -> PostResult:
         params = {
             'message': message,
-            'access_token': creds['access_token']
+            'access_token': self._creds['access_token']
         }
         
-        response = requests.post(url, data=params)
+        session = await self._get_http()
+        async with session.post(self._feed_url, data=params) as response:
+            data = await response.json(content_type=None)
         
-        if response.status_code != 200:
-            error = response.json().get('error', {}).get('message', '未知錯誤')
+        if response.status != 200:
+            error = data.get('error', {}).get('message', '未知錯誤')
             return PostResult(False, "facebook", error=error)
         
-        post_id = response.json().get('id')
+        post_id = data.get('id')
         if post_id:
             post_url = f"https://www.facebook.com/{post_id.replace('_', '/posts/')}"
             self.log_info(f"✅ Facebook 發布成功: {post_url}")
@@ -276,32 +347,50 @@ class FacebookAgent(BaseAgent):
         hashtags = ' '.join(post.hashtags)
         
         if content:
-            return f"""🎉 {content.title_zh}
-{content.title_en}
-
-{content.content_zh}
-
-{content.content_en}
-
-{hashtags}"""
+            parts = (
+                "🎉 ", content.title_zh, "\n",
+                content.title_en, "\n\n",
+                content.content_zh, "\n\n",
+                content.content_en, "\n\n",
+                hashtags
+            )
         else:
-            return f"""🎉 {post.title}
-
-{post.content}
-
-{hashtags}"""
+            parts = (
+                "🎉 ", post.title, "\n\n",
+                post.content, "\n\n",
+                hashtags
+            )
+        return "".join(parts)
 
 
 class InstagramAgent(BaseAgent):
     """Instagram 發文代理"""
     
+    # 每則貼文固定附加的 hashtags
+    _STATIC_TAGS = "#NYCU #AI #Research #Innovation #Taiwan #Award"
+    
     def __init__(self):
         super().__init__("InstagramAgent")
         self.config = Config()
         self.api_url = "https://graph.facebook.com/v21.0"
+        
+        # 憑證和 API 網址在建立時算好，發文時直接使用
+        self._creds = self.config.get('instagram', {})
+        self._has_creds = bool(
+            self._creds.get('access_token') and self._creds.get('instagram_account_id')
+        )
+        ig_account_id = self._creds.get('instagram_account_id')
+        self._media_url = f"{self.api_url}/{ig_account_id}/media"
+        self._publish_url = f"{self.api_url}/{ig_account_id}/media_publish"
+    
+    async def start(self):
+        """建立 HTTP session 供 Graph API 使用"""
+        await self._get_http()
     
     def _setup_handlers(self):
         self.register_handler(MessageType.POST_REQUEST, self._handle_post_request)
+        self.register_handler(MessageType.BROADCAST_POST_REQUEST, self._handle_post_request)
+        self.message_bus.join_group(SOCIAL_BROADCAST, self)
     
     async def _handle_post_request(self, message: AgentMessage):
         payload = message.payload
@@ -313,15 +402,18 @@ class InstagramAgent(BaseAgent):
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.POST_RESULT,
-            payload={'platform': 'instagram', 'result': result}
+            payload={
+                'platform': 'instagram',
+                'result': result,
+                'task_id': payload.get('task_id')
+            }
         )
     
     async def handle_message(self, message: AgentMessage):
         pass
     
     def _has_credentials(self) -> bool:
-        creds = self.config.get('instagram', {})
-        return bool(creds.get('access_token') and creds.get('instagram_account_id'))
+        return self._has_creds
     
     async def post(self, post: SocialPost, image_url: str = None) -> PostResult:
         """發布 Instagram 貼文"""
@@ -333,15 +425,12 @@ class InstagramAgent(BaseAgent):
             return PostResult(False, "instagram", error="Instagram 需要圖片")
         
         try:
-            creds = self.config.get('instagram', {})
             caption = self._format_post(post)
             
-            ig_account_id = creds.get('instagram_account_id')
-            access_token = creds.get('access_token')
+            access_token = self._creds.get('access_token')
             encoded_url = encode_image_url(final_image_url)
             
             # Step 1: Create media container
-            create_url = f"{self.api_url}/{ig_account_id}/media"
             create_params = {
                 'image_url': encoded_url,
                 'caption': caption,
@@ -349,28 +438,32 @@ class InstagramAgent(BaseAgent):
                 'access_token': access_token
             }
             
-            create_response = requests.post(create_url, params=create_params)
+            session = await self._get_http()
+            async with session.post(self._media_url, params=create_params) as create_response:
+                create_data = await create_response.json(content_type=None)
             
-            if create_response.status_code != 200:
-                error = create_response.json().get('error', {}).get('message', '未知錯誤')
+            if create_response.status != 200:
+                error = create_data.get('error', {}).get('message', '未知錯誤')
                 return PostResult(False, "instagram", error=f"建立媒體失敗: {error}")
             
-            container_id = create_response.json().get('id')
+            container_id = create_data.get('id')
+            if not container_id:
+                return PostResult(False, "instagram", error="建立媒體失敗: 無回應資料")
             
             # Step 2: Publish
-            publish_url = f"{self.api_url}/{ig_account_id}/media_publish"
             publish_params = {
                 'creation_id': container_id,
                 'access_token': access_token
             }
             
-            publish_response = requests.post(publish_url, params=publish_params)
+            async with session.post(self._publish_url, params=publish_params) as publish_response:
+                publish_data = await publish_response.json(content_type=None)
             
-            if publish_response.status_code != 200:
-                error = publish_response.json().get('error', {}).get('message', '未知錯誤')
+            if publish_response.status != 200:
+                error = publish_data.get('error', {}).get('message', '未知錯誤')
                 return PostResult(False, "instagram", error=f"發布失敗: {error}")
             
-            post_id = publish_response.json().get('id')
+            post_id = publish_data.get('id')
             post_url = f"https://www.instagram.com/p/{post_id}/"
             
             self.log_info(f"✅ Instagram 發布成功: {post_url}")
@@ -385,23 +478,19 @@ class InstagramAgent(BaseAgent):
         hashtags = ' '.join(post.hashtags)
         
         if content:
-            text = f"""🎉 {content.title_zh}
-{content.title_en}
-
-{content.content_zh[:150]}
-
-{content.content_en[:150]}
-
-{hashtags}
-
-#NYCU #AI #Research #Innovation #Taiwan #Award"""
+            parts = (
+                "🎉 ", content.title_zh, "\n",
+                content.title_en, "\n\n",
+                content.content_zh[:150], "\n\n",
+                content.content_en[:150], "\n\n",
+                hashtags, "\n\n",
+                self._STATIC_TAGS
+            )
         else:
-            text = f"""🎉 {post.title}
-
-{post.content[:250]}
-
-{hashtags}
-
-#NYCU #AI #Research #Innovation #Taiwan #Award"""
-        
-        return text[:2200]
+            parts = (
+                "🎉 ", post.title, "\n\n",
+                post.content[:250], "\n\n",
+                hashtags, "\n\n",
+                self._STATIC_TAGS
+            )
+        return "".join(parts)[:2200]
@@ -4,21 +4,149 @@
 Social Media Posting Agents - Part 2
 LinkedIn 和 Reddit 發文代理
 """
+import asyncio
+import hashlib
 import os
 import tempfile
-from typing import Optional
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
 
-import requests
+import orjson
 import praw
 
 from models import (
     SocialPost, 
     PostResult,
     AgentMessage, 
-    MessageType
+    MessageType,
+    SOCIAL_BROADCAST
 )
 from base_agent import BaseAgent
-from config import Config
+from config import Config, to_thread_fast
+from image_cache import SPOOL_DIR, image_cache
+
+
+# LinkedIn 用戶 ID 快取（跨代理實例共用）：token 雜湊 -> (user_id, 到期時間)
+_USER_ID_TTL = 3600
+_USER_ID_CACHE: Dict[str, Tuple[str, float]] = {}
+_USER_ID_LOCKS: Dict[str, asyncio.Lock] = {}
+
+
+def _token_key(token: str) -> str:
+    """以 token 的 sha256 前 8 bytes 作為快取鍵，不在記憶體中以明文當鍵"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def _cached_user_id(key: str) -> Optional[str]:
+    entry = _USER_ID_CACHE.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+# LinkedIn 請求遇到這些狀態碼時重試（5xx 不適用於會建立貼文的請求）
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+_MAX_ATTEMPTS = 3
+_MAX_RETRY_DELAY = 60
+
+
+def _single_flight(
+    inflight: Dict[Hashable, asyncio.Task],
+    key: Hashable,
+    factory: Callable[[], Awaitable[PostResult]]
+) -> Awaitable[PostResult]:
+    """
+    同一個 key 同時只執行一次（例如重試時重複送達的同一則貼文）
+    其他呼叫者等待同一個結果，不會重複發文
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    # 個別呼叫者被取消時不影響正在進行的發文
+    return asyncio.shield(task)
+
+
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """依 Retry-After 標頭（秒數）決定等待時間，沒有或無法解析時以指數退避"""
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = 0.5 * 2 ** attempt
+    return min(max(delay, 0), _MAX_RETRY_DELAY)
+
+
+# 貼文模板（模組載入時建立一次，發文時以 format_map 填入）
+_LINKEDIN_TMPL_CONTENT = """🎉 [陽明交通大學 AI 學院獲獎公告]
+🎉 [NYCU AI College Award Announcement]
+
+{zh}
+
+{en}
+
+{tags}
+
+#NYCU #ArtificialIntelligence #Research #Innovation #Award"""
+
+_LINKEDIN_TMPL_PLAIN = """🎉 [陽明交通大學 AI 學院獲獎公告]
+
+{title}
+
+{content}
+
+{tags}
+
+#NYCU #ArtificialIntelligence #Research #Innovation #Award"""
+
+_REDDIT_POST_TMPL_CONTENT = """**🎉 {title_zh}**
+**{title_en}**
+
+{zh}
+
+{en}
+
+---
+
+*此為陽明交通大學 AI 學院獲獎公告*
+*NYCU AI College Award Announcement*
+
+相關標籤 / Tags: {tags}
+"""
+
+_REDDIT_POST_TMPL_PLAIN = """**🎉 {title}**
+
+{content}
+
+---
+
+*此為陽明交通大學 AI 學院獲獎公告*
+
+相關標籤: {tags}
+"""
+
+_REDDIT_COMMENT_TMPL_CONTENT = """{zh}
+
+{en}
+
+---
+
+*NYCU AI College Award Announcement*
+
+Tags: {tags}
+"""
+
+_REDDIT_COMMENT_TMPL_PLAIN = """{content}
+
+---
+
+*NYCU AI College Award Announcement*
+
+Tags: {tags}
+"""
+
+# Reddit 標籤去掉 # 符號
+_HASH_TBL = str.maketrans('', '', '#')
 
 
 class LinkedInAgent(BaseAgent):
@@ -28,10 +156,24 @@ class LinkedInAgent(BaseAgent):
         super().__init__("LinkedInAgent")
         self.config = Config()
         self.api_url = "https://api.linkedin.com/v2"
-        self.user_id = None
+        
+        # 憑證和請求標頭只在建立時組合一次
+        self._creds = self.config.get('linkedin', {})
+        self._has_creds = bool(self._creds.get('access_token'))
+        self._user_id_key = _token_key(self._creds.get('access_token', ''))
+        self._auth_headers = {'Authorization': f"Bearer {self._creds.get('access_token', '')}"}
+        self._json_headers = {
+            **self._auth_headers,
+            'Content-Type': 'application/json',
+            'X-Restli-Protocol-Version': '2.0.0'
+        }
+        self._upload_headers = {**self._auth_headers, 'Content-Type': 'application/octet-stream'}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
     
     def _setup_handlers(self):
         self.register_handler(MessageType.POST_REQUEST, self._handle_post_request)
+        self.register_handler(MessageType.BROADCAST_POST_REQUEST, self._handle_post_request)
+        self.message_bus.join_group(SOCIAL_BROADCAST, self)
     
     async def _handle_post_request(self, message: AgentMessage):
         payload = message.payload
@@ -43,51 +185,82 @@ class LinkedInAgent(BaseAgent):
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.POST_RESULT,
-            payload={'platform': 'linkedin', 'result': result}
+            payload={
+                'platform': 'linkedin',
+                'result': result,
+                'task_id': payload.get('task_id')
+            }
         )
     
     async def handle_message(self, message: AgentMessage):
         pass
     
     def _has_credentials(self) -> bool:
-        creds = self.config.get('linkedin', {})
-        return bool(creds.get('access_token'))
+        return self._has_creds
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        retry_server_errors: bool = True,
+        data=None,
+        **kwargs
+    ) -> Tuple[int, bytes]:
+        """
+        送出 LinkedIn API 請求並回傳 (狀態碼, 回應內容)
+        429 和 5xx 會依 Retry-After 或指數退避重試，最多 _MAX_ATTEMPTS 次；
+        retry_server_errors=False 時只重試 429（用於會建立貼文的請求，避免重複發文）
+        data 可傳入函式，每次嘗試時呼叫取得新的 body（檔案送出後會被關閉，不能重用）
+        """
+        session = await self._get_http()
+        for attempt in range(_MAX_ATTEMPTS):
+            payload = data() if callable(data) else data
+            async with session.request(method, url, data=payload, **kwargs) as response:
+                body = await response.read()
+                status = response.status
+                retryable = status == 429 or (retry_server_errors and status in _RETRY_STATUS)
+                if not retryable or attempt == _MAX_ATTEMPTS - 1:
+                    return status, body
+                delay = _retry_delay(response.headers.get('Retry-After'), attempt)
+            
+            self.log_warning("LinkedIn 回應 %d，%.1f 秒後重試", status, delay)
+            await asyncio.sleep(delay)
     
     async def _get_user_id(self) -> Optional[str]:
-        """獲取 LinkedIn 用戶 ID"""
-        if self.user_id:
-            return self.user_id
+        """獲取 LinkedIn 用戶 ID（快取一小時，同一 token 同時只查詢一次）"""
+        key = self._user_id_key
+        user_id = _cached_user_id(key)
+        if user_id:
+            return user_id
         
-        try:
-            creds = self.config.get('linkedin', {})
-            headers = {'Authorization': f"Bearer {creds['access_token']}"}
-            
-            response = requests.get(
-                'https://api.linkedin.com/v2/userinfo',
-                headers=headers
-            )
+        async with _USER_ID_LOCKS.setdefault(key, asyncio.Lock()):
+            # 等待鎖期間可能已由其他呼叫查詢完成
+            user_id = _cached_user_id(key)
+            if user_id:
+                return user_id
             
-            if response.status_code != 200:
-                self.log_error("獲取用戶 ID 失敗")
+            try:
+                status, body = await self._request(
+                    'GET',
+                    'https://api.linkedin.com/v2/userinfo',
+                    headers=self._auth_headers
+                )
+                if status != 200:
+                    self.log_error("獲取用戶 ID 失敗")
+                    return None
+                
+                user_id = orjson.loads(body).get('sub')
+                if user_id:
+                    _USER_ID_CACHE[key] = (user_id, time.monotonic() + _USER_ID_TTL)
+                return user_id
+                
+            except Exception as e:
+                self.log_error(f"獲取用戶 ID 錯誤: {e}")
                 return None
-            
-            self.user_id = response.json().get('sub')
-            return self.user_id
-            
-        except Exception as e:
-            self.log_error(f"獲取用戶 ID 錯誤: {e}")
-            return None
     
     async def _upload_image(self, image_url: str, user_id: str) -> Optional[str]:
         """上傳圖片到 LinkedIn"""
         try:
-            creds = self.config.get('linkedin', {})
-            headers = {
-                'Authorization': f"Bearer {creds['access_token']}",
-                'Content-Type': 'application/json',
-                'X-Restli-Protocol-Version': '2.0.0'
-            }
-            
             # 註冊上傳
             register_payload = {
                 "registerUploadRequest": {
@@ -100,48 +273,59 @@ class LinkedInAgent(BaseAgent):
                 }
             }
             
-            register_response = requests.post(
-                f"{self.api_url}/assets?action=registerUpload",
-                headers=headers,
-                json=register_payload
-            )
-            
-            if register_response.status_code not in [200, 201]:
-                self.log_error(f"註冊上傳失敗: {register_response.text}")
-                return None
-            
-            register_data = register_response.json()
-            asset = register_data['value']['asset']
-            upload_url = register_data['value']['uploadMechanism'][
-                'com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl']
-            
-            # 下載圖片
-            image_response = requests.get(image_url, timeout=30)
-            image_response.raise_for_status()
-            
-            # 上傳圖片
-            upload_headers = {
-                'Authorization': f"Bearer {creds['access_token']}",
-                'Content-Type': 'application/octet-stream'
-            }
-            
-            upload_response = requests.put(
-                upload_url,
-                headers=upload_headers,
-                data=image_response.content
-            )
-            
-            if upload_response.status_code not in [200, 201]:
-                return None
-            
-            return asset
+            session = await self._get_http()
+            # 註冊上傳與下載圖片互不相依，先開始下載再送出註冊請求
+            # 圖片經由共用快取取得，RedditAgent 發布同一張圖時不會再下載一次
+            download = asyncio.create_task(image_cache.fetch(image_url, session))
+            image = None
+            try:
+                status, body = await self._request(
+                    'POST',
+                    f"{self.api_url}/assets?action=registerUpload",
+                    headers=self._json_headers,
+                    data=orjson.dumps(register_payload)
+                )
+                if status not in [200, 201]:
+                    self.log_error(f"註冊上傳失敗: {body.decode(errors='replace')}")
+                    return None
+                
+                register_data = orjson.loads(body)
+                
+                asset = register_data['value']['asset']
+                upload_url = register_data['value']['uploadMechanism'][
+                    'com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl']
+                
+                image = await download
+                
+                # 上傳圖片（大圖片直接從暫存檔串流，上傳期間持有暫存檔）
+                with image:
+                    status, _ = await self._request(
+                        'PUT',
+                        upload_url,
+                        headers=self._upload_headers,
+                        data=image.payload
+                    )
+                if status not in [200, 201]:
+                    return None
+                
+                return asset
+            finally:
+                # 註冊失敗時不再等待圖片（快取中的下載仍會完成，供其他平台使用）
+                if not download.done():
+                    download.cancel()
+                elif not download.cancelled() and download.exception() is None and image is None:
+                    download.result().release()
             
         except Exception as e:
             self.log_error(f"上傳圖片錯誤: {e}")
             return None
     
     async def post(self, post: SocialPost, image_url: str = None) -> PostResult:
-        """發布 LinkedIn 貼文"""
+        """發布 LinkedIn 貼文（同一則貼文同時只會發布一次）"""
+        key = (post.url or post.title, image_url)
+        return await _single_flight(self._inflight, key, lambda: self._post(post, image_url))
+    
+    async def _post(self, post: SocialPost, image_url: str = None) -> PostResult:
         if not self._has_credentials():
             return PostResult(False, "linkedin", error="憑證不完整")
         
@@ -150,7 +334,6 @@ class LinkedInAgent(BaseAgent):
             if not user_id:
                 return PostResult(False, "linkedin", error="無法獲取用戶 ID")
             
-            creds = self.config.get('linkedin', {})
             post_content = self._format_post(post)
             final_image_url = image_url or post.image_url
             
@@ -159,58 +342,45 @@ class LinkedInAgent(BaseAgent):
             if final_image_url:
                 media_asset = await self._upload_image(final_image_url, user_id)
             
-            headers = {
-                'Authorization': f"Bearer {creds['access_token']}",
-                'Content-Type': 'application/json',
-                'X-Restli-Protocol-Version': '2.0.0'
+            share_content = {
+                "shareCommentary": {"text": post_content},
+                "shareMediaCategory": "NONE"
             }
-            
             if media_asset:
-                payload = {
-                    "author": f"urn:li:person:{user_id}",
-                    "lifecycleState": "PUBLISHED",
-                    "specificContent": {
-                        "com.linkedin.ugc.ShareContent": {
-                            "shareCommentary": {"text": post_content},
-                            "shareMediaCategory": "IMAGE",
-                            "media": [{
-                                "status": "READY",
-                                "description": {"text": post.title[:200]},
-                                "media": media_asset,
-                                "title": {"text": post.title[:100]}
-                            }]
-                        }
-                    },
-                    "visibility": {
-                        "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
-                    }
-                }
-            else:
-                payload = {
-                    "author": f"urn:li:person:{user_id}",
-                    "lifecycleState": "PUBLISHED",
-                    "specificContent": {
-                        "com.linkedin.ugc.ShareContent": {
-                            "shareCommentary": {"text": post_content},
-                            "shareMediaCategory": "NONE"
-                        }
-                    },
-                    "visibility": {
-                        "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
-                    }
+                share_content["shareMediaCategory"] = "IMAGE"
+                share_content["media"] = [{
+                    "status": "READY",
+                    "description": {"text": post.title[:200]},
+                    "media": media_asset,
+                    "title": {"text": post.title[:100]}
+                }]
+            
+            payload = {
+                "author": f"urn:li:person:{user_id}",
+                "lifecycleState": "PUBLISHED",
+                "specificContent": {
+                    "com.linkedin.ugc.ShareContent": share_content
+                },
+                "visibility": {
+                    "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
                 }
+            }
             
-            response = requests.post(
+            # 圖片已上傳完成，發文失敗重試時只重送這一步
+            status, body = await self._request(
+                'POST',
                 f"{self.api_url}/ugcPosts",
-                headers=headers,
-                json=payload
+                headers=self._json_headers,
+                data=orjson.dumps(payload),
+                retry_server_errors=False
             )
+            data = orjson.loads(body)
             
-            if response.status_code not in [200, 201]:
-                error = response.json().get('message', '未知錯誤')
+            if status not in [200, 201]:
+                error = data.get('message', '未知錯誤')
                 return PostResult(False, "linkedin", error=error)
             
-            post_id = response.json().get('id', '')
+            post_id = data.get('id', '')
             post_url = f"https://www.linkedin.com/feed/update/{post_id}/"
             
             self.log_info(f"✅ LinkedIn 發布成功: {post_url}")
@@ -225,40 +395,63 @@ class LinkedInAgent(BaseAgent):
         hashtags = ' '.join(post.hashtags)
         
         if content:
-            return f"""🎉 [陽明交通大學 AI 學院獲獎公告]
-🎉 [NYCU AI College Award Announcement]
-
-{content.content_zh}
-
-{content.content_en}
-
-{hashtags}
-
-#NYCU #ArtificialIntelligence #Research #Innovation #Award"""
+            return _LINKEDIN_TMPL_CONTENT.format_map({
+                'zh': content.content_zh,
+                'en': content.content_en,
+                'tags': hashtags
+            })
         else:
-            return f"""🎉 [陽明交通大學 AI 學院獲獎公告]
-
-{post.title}
-
-{post.content}
-
-{hashtags}
-
-#NYCU #ArtificialIntelligence #Research #Innovation #Award"""
+            return _LINKEDIN_TMPL_PLAIN.format_map({
+                'title': post.title,
+                'content': post.content,
+                'tags': hashtags
+            })
 
 
 class RedditAgent(BaseAgent):
     """Reddit 發文代理"""
     
+    COMMENT_RETRY_DELAY = 5  # 評論失敗後重試前等待秒數
+    CLOSE_TIMEOUT = 20  # 關閉時等待評論重試完成的最長秒數（需大於重試等待時間）
+    
     def __init__(self):
         super().__init__("RedditAgent")
         self.config = Config()
+        self._creds = self.config.get('reddit', {})
         self.reddit = None
-        self._init_client()
+        # 客戶端在第一次發文時才建立，避免啟動時就送出驗證請求
+        self._client_checked = False
+        self._client_lock = asyncio.Lock()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+    
+    async def close(self):
+        """等待評論重試完成（最多 CLOSE_TIMEOUT 秒），逾時才取消"""
+        if self._background:
+            self.log_info("等待 %d 個評論重試完成...", len(self._background))
+            _, pending = await asyncio.wait(self._background, timeout=self.CLOSE_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.log_warning("⚠️ %d 個評論重試逾時，已取消", len(pending))
+        self._background.clear()
+        await super().close()
+    
+    async def _ensure_client(self) -> bool:
+        """
+        取得可用的 Reddit 客戶端（只初始化一次）
+        praw 為同步函式庫，初始化與帳號驗證在執行緒池執行，不阻塞事件迴圈
+        """
+        if not self._client_checked:
+            async with self._client_lock:
+                if not self._client_checked:
+                    await to_thread_fast(self._init_client)
+                    self._client_checked = True
+        return self.reddit is not None
     
     def _init_client(self):
         """初始化 Reddit 客戶端"""
-        creds = self.config.get('reddit', {})
+        creds = self._creds
         
         if not all(creds.get(k) for k in ['client_id', 'client_secret', 'username', 'password']):
             self.log_warning("Reddit 憑證不完整")
@@ -280,6 +473,8 @@ class RedditAgent(BaseAgent):
     
     def _setup_handlers(self):
         self.register_handler(MessageType.POST_REQUEST, self._handle_post_request)
+        self.register_handler(MessageType.BROADCAST_POST_REQUEST, self._handle_post_request)
+        self.message_bus.join_group(SOCIAL_BROADCAST, self)
     
     async def _handle_post_request(self, message: AgentMessage):
         payload = message.payload
@@ -292,7 +487,11 @@ class RedditAgent(BaseAgent):
         await self.send_message(
             receiver="MotherAgent",
             msg_type=MessageType.POST_RESULT,
-            payload={'platform': 'reddit', 'result': result}
+            payload={
+                'platform': 'reddit',
+                'result': result,
+                'task_id': payload.get('task_id')
+            }
         )
     
     async def handle_message(self, message: AgentMessage):
@@ -304,8 +503,19 @@ class RedditAgent(BaseAgent):
         subreddit: str = "test",
         image_url: str = None
     ) -> PostResult:
-        """發布 Reddit 貼文"""
-        if not self.reddit:
+        """發布 Reddit 貼文（同一則貼文同時只會發布一次）"""
+        key = (post.url or post.title, subreddit, image_url)
+        return await _single_flight(
+            self._inflight, key, lambda: self._post(post, subreddit, image_url)
+        )
+    
+    async def _post(
+        self,
+        post: SocialPost,
+        subreddit: str,
+        image_url: Optional[str]
+    ) -> PostResult:
+        if not await self._ensure_client():
             return PostResult(False, "reddit", error="客戶端未初始化")
         
         try:
@@ -330,25 +540,23 @@ class RedditAgent(BaseAgent):
     ) -> PostResult:
         temp_file = None
         try:
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            file_ext = '.jpg'
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-                tmp.write(response.content)
-                temp_file = tmp.name
-            
-            subreddit_obj = self.reddit.subreddit(subreddit)
-            submission = subreddit_obj.submit_image(title=title, image_path=temp_file)
-            
-            # 添加評論
-            comment_text = self._format_comment(post)
-            submission.reply(comment_text)
-            
-            self.log_info(f"✅ Reddit 發布成功: {submission.url}")
-            return PostResult(True, "reddit", submission.id, submission.url)
+            # 發布期間持有圖片，快取的暫存檔不會被刪除
+            with await image_cache.fetch(image_url, await self._get_http()) as image:
+                # praw 的 submit_image 只接受檔案路徑；大圖片已在快取的暫存檔中，直接使用
+                image_path = image.path
+                if image_path is None:
+                    file_ext = '.jpg'
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext, dir=SPOOL_DIR) as tmp:
+                        tmp.write(image.data)
+                        temp_file = image_path = tmp.name
+                
+                subreddit_obj = self.reddit.subreddit(subreddit)
+                submission = await to_thread_fast(
+                    subreddit_obj.submit_image, title=title, image_path=image_path
+                )
             
         except Exception as e:
+            # 下載或圖片貼文失敗時貼文尚未建立，改發純文字貼文
             self.log_error(f"圖片發布失敗: {e}")
             return await self._post_text(title, post, subreddit)
         finally:
@@ -357,6 +565,28 @@ class RedditAgent(BaseAgent):
                     os.remove(temp_file)
                 except:
                     pass
+        
+        # 添加評論（貼文已建立，評論失敗不影響發布結果，稍後在背景重試）
+        comment_text = self._format_comment(post)
+        try:
+            await to_thread_fast(submission.reply, comment_text)
+        except Exception as e:
+            self.log_warning("評論失敗，稍後重試: %s", e)
+            task = asyncio.create_task(self._retry_comment(submission, comment_text))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        
+        self.log_info("✅ Reddit 發布成功: %s", submission.url)
+        return PostResult(True, "reddit", submission.id, submission.url)
+    
+    async def _retry_comment(self, submission, comment_text: str):
+        """在背景重試貼文評論"""
+        await asyncio.sleep(self.COMMENT_RETRY_DELAY)
+        try:
+            await to_thread_fast(submission.reply, comment_text)
+            self.log_info("✅ 評論重試成功: %s", submission.url)
+        except Exception as e:
+            self.log_error("評論重試失敗: %s", e)
     
     async def _post_text(
         self,
@@ -367,7 +597,9 @@ class RedditAgent(BaseAgent):
         try:
             post_content = self._format_post(post)
             subreddit_obj = self.reddit.subreddit(subreddit)
-            submission = subreddit_obj.submit(title=title, selftext=post_content)
+            submission = await to_thread_fast(
+                subreddit_obj.submit, title=title, selftext=post_content
+            )
             
             self.log_info(f"✅ Reddit 發布成功: {submission.url}")
             return PostResult(True, "reddit", submission.id, submission.url)
@@ -378,56 +610,35 @@ class RedditAgent(BaseAgent):
     
     def _format_post(self, post: SocialPost) -> str:
         content = post.generated_content
-        hashtags = ', '.join([tag.replace('#', '') for tag in post.hashtags])
+        hashtags = ', '.join(post.hashtags).translate(_HASH_TBL)
         
         if content:
-            return f"""**🎉 {content.title_zh}**
-**{content.title_en}**
-
-{content.content_zh}
-
-{content.content_en}
-
----
-
-*此為陽明交通大學 AI 學院獲獎公告*
-*NYCU AI College Award Announcement*
-
-相關標籤 / Tags: {hashtags}
-"""
+            return _REDDIT_POST_TMPL_CONTENT.format_map({
+                'title_zh': content.title_zh,
+                'title_en': content.title_en,
+                'zh': content.content_zh,
+                'en': content.content_en,
+                'tags': hashtags
+            })
         else:
-            return f"""**🎉 {post.title}**
-
-{post.content}
-
----
-
-*此為陽明交通大學 AI 學院獲獎公告*
-
-相關標籤: {hashtags}
-"""
+            return _REDDIT_POST_TMPL_PLAIN.format_map({
+                'title': post.title,
+                'content': post.content,
+                'tags': hashtags
+            })
     
     def _format_comment(self, post: SocialPost) -> str:
         content = post.generated_content
-        hashtags = ', '.join([tag.replace('#', '') for tag in post.hashtags])
+        hashtags = ', '.join(post.hashtags).translate(_HASH_TBL)
         
         if content:
-            return f"""{content.content_zh}
-
-{content.content_en}
-
----
-
-*NYCU AI College Award Announcement*
-
-Tags: {hashtags}
-"""
+            return _REDDIT_COMMENT_TMPL_CONTENT.format_map({
+                'zh': content.content_zh,
+                'en': content.content_en,
+                'tags': hashtags
+            })
         else:
-            return f"""{post.content}
-
----
-
-*NYCU AI College Award Announcement*
-
-Tags: {hashtags}
-"""
+            return _REDDIT_COMMENT_TMPL_PLAIN.format_map({
+                'content': post.content,
+                'tags': hashtags
+            })